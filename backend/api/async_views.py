@@ -0,0 +1,137 @@
+"""Асинхронные версии самых частых запросов на чтение для режима ASGI.
+
+Асинхронны только список тегов, список ингредиентов и выгрузка списка
+покупок. Подключаются в api.urls перед роутером, если SERVER_MODE=asgi.
+Запросы, которые здесь не обрабатываются (другие методы, ?search=),
+передаются обычным вьюсетам DRF через sync_to_async; список и карточка
+рецепта, как и остальное API, остаются синхронными.
+
+Выигрыш от режима не гарантирован: перед переключением сравните оба
+сервера одной нагрузкой, например
+manage.py load_test http://wsgi:8000 http://asgi:8000 --path /api/tags/
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Revision, Tag
+
+from .authentication import CachedTokenAuthentication
+from .cache import make_etag, patch_validators
+from .renderers import ShoppingListNegotiation
+from .serializers import IngredientSerializer, TagSerializer
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+tag_list_sync = sync_to_async(TagViewSet.as_view({'get': 'list'}))
+ingredient_list_sync = sync_to_async(
+    IngredientViewSet.as_view({'get': 'list'})
+)
+download_shopping_cart_sync = sync_to_async(
+    RecipeViewSet.as_view({'get': 'download_shopping_cart'})
+)
+
+
+def csrf_exempt(view):
+    # django.views.decorators.csrf.csrf_exempt в Django 4.2 превращает
+    # корутину в синхронную функцию.
+    view.csrf_exempt = True
+    return view
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+async def catalog_response(request, namespace, build):
+    """Ответ справочника с ETag/Last-Modified по штампу Revision."""
+    stamp, = await sync_to_async(Revision.objects.stamps)(namespace)
+    etag = make_etag(namespace, stamp.isoformat())
+    last_modified = int(stamp.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = json_response(await build())
+    return patch_validators(response, etag, last_modified)
+
+
+@csrf_exempt
+async def tag_list(request):
+    if request.method != 'GET':
+        return await tag_list_sync(request)
+
+    async def build():
+        tags = [tag async for tag in Tag.objects.all()]
+        return TagSerializer(tags, many=True).data
+
+    return await catalog_response(request, 'tags', build)
+
+
+@csrf_exempt
+async def ingredient_list(request):
+    if request.method != 'GET' or 'search' in request.GET:
+        return await ingredient_list_sync(request)
+    name = request.GET.get('name')
+
+    async def build():
+        if name:
+            return await sync_to_async(ingredient_index.search)(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            )
+        ingredients = [
+            ingredient async for ingredient in Ingredient.objects.all()
+        ]
+        return IngredientSerializer(ingredients, many=True).data
+
+    return await catalog_response(request, 'ingredients', build)
+
+
+def error_response(error):
+    response = json_response({'detail': error.detail}, error.status_code)
+    if isinstance(error, NotAuthenticated):
+        response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+    return response
+
+
+@csrf_exempt
+async def download_shopping_cart(request):
+    if request.method != 'GET':
+        return await download_shopping_cart_sync(request)
+    try:
+        credentials = await sync_to_async(
+            CachedTokenAuthentication().authenticate
+        )(request)
+    except APIException as error:
+        return error_response(error)
+    if credentials is None:
+        return error_response(NotAuthenticated())
+    user, _ = credentials
+    try:
+        renderer, media_type = ShoppingListNegotiation().select_renderer(
+            request,
+            [
+                renderer_class() for renderer_class in
+                RecipeViewSet.download_shopping_cart.kwargs[
+                    'renderer_classes'
+                ]
+            ],
+        )
+    except Http404:
+        return error_response(NotFound())
+    ingredients = RecipeViewSet.get_shopping_list(user).aiterator(
+        chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+    )
+    response = StreamingHttpResponse(
+        renderer.astream(ingredients),
+        content_type=f'{media_type}; charset={renderer.charset}',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{renderer.format}"'
+    )
+    return response
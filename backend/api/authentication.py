@@ -0,0 +1,155 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SHARED_KEY = 'auth-token:{}'
+SHARED_EXCLUDE = ('password',)
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токенов с временем жизни записей."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL
+)
+
+
+def get_shared_cache():
+    alias = settings.AUTH_TOKEN_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def get_shared_key(key):
+    return SHARED_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def to_shared(user, token):
+    """Значения полей пользователя без пароля для общего кеша.
+
+    Сам ключ токена и хеш пароля в общий кеш не попадают.
+    """
+    return {
+        'user': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname not in SHARED_EXCLUDE
+        },
+        'created': token.created,
+    }
+
+
+def from_shared(key, data):
+    """Пара (пользователь, токен) из записи to_shared.
+
+    Исключённые поля остаются отложенными и при обращении
+    загружаются из БД.
+    """
+    fields = data['user']
+    user = get_user_model().from_db(
+        Token.objects.db, list(fields), list(fields.values())
+    )
+    token = Token.from_db(
+        Token.objects.db,
+        ['key', 'user_id', 'created'],
+        [key, user.pk, data['created']],
+    )
+    token.user = user
+    return user, token
+
+
+def invalidate_tokens(*keys):
+    """Удаляет токены из локального и общего кешей.
+
+    Локальные кеши других процессов не затрагиваются и устаревают
+    не позднее чем через AUTH_TOKEN_CACHE_TTL, поэтому при нескольких
+    процессах нужен AUTH_TOKEN_SHARED_CACHE.
+    """
+    for key in keys:
+        token_cache.delete(key)
+    shared = get_shared_cache()
+    if shared is not None and keys:
+        shared.delete_many([get_shared_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        *Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для недавно виденных токенов.
+
+    Если задан AUTH_TOKEN_SHARED_CACHE, пара (пользователь, токен)
+    хранится только в общем кеше по хешу ключа и без секретов
+    (to_shared): локальный LRU других процессов нельзя очистить, и
+    отозванный токен продолжал бы работать в них. Без общего кеша
+    используется LRU процесса. Записи удаляются сигналами api.signals
+    при выходе, смене пароля и деактивации.
+    """
+
+    def authenticate_credentials(self, key):
+        shared = get_shared_cache()
+        if shared is None:
+            credentials = token_cache.get(key)
+        else:
+            data = shared.get(get_shared_key(key))
+            credentials = data and from_shared(key, data)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            if shared is None:
+                token_cache.set(key, credentials)
+            else:
+                shared.set(
+                    get_shared_key(key),
+                    to_shared(*credentials),
+                    settings.AUTH_TOKEN_SHARED_CACHE_TTL,
+                )
+        user, token = credentials
+        # Копия защищает закешированный объект от изменений в запросе.
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
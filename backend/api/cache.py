@@ -0,0 +1,166 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+VERSION_KEY = 'response-cache:version:{}'
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имён кеша ответов."""
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начальная версия от времени: после вытеснения ключа
+            # счётчик не вернётся к уже использованным значениям.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*namespaces):
+    """Инвалидирует все закешированные ответы пространств имён."""
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_stats():
+    """Счётчики кеша ответов.
+
+    С LocMemCache они относятся только к процессу, ответившему
+    на запрос: per_process=True.
+    """
+    counters = cache.get_many((HITS_KEY, MISSES_KEY))
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else None,
+        'per_process': isinstance(
+            caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)
+        ),
+    }
+
+
+class AnonymousCacheMixin:
+    """Кеш ответов list/retrieve для анонимных пользователей.
+
+    Ключ строится из пути, отсортированных параметров запроса и версий
+    cache_namespaces, которые повышаются сигналами api.signals.
+    """
+
+    cache_namespaces = ()
+
+    def get_response_cache_key(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        versions = get_versions(self.cache_namespaces)
+        raw_key = f'{request.get_host()}{request.path}?{query}:{versions}'
+        return 'response-cache:{}'.format(
+            hashlib.md5(raw_key.encode()).hexdigest()
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        increment(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def patch_validators(response, etag, last_modified):
+    """Заголовки ETag/Last-Modified для ответов 200 и 304.
+
+    last_modified - метка времени в секундах.
+    """
+    if response.status_code in (200, 304):
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на If-None-Match/If-Modified-Since до сериализации.
+
+    get_validators() возвращает пару (etag, last_modified), вычисленную
+    по штампам изменений без построения ответа; (None, None) отключает
+    условную обработку.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        return None, None
+
+    def get_conditional(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        if etag is None and last_modified is None:
+            return handler(request, *args, **kwargs)
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return patch_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,12 +1,25 @@
 import django_filters
-from recipes.models import Ingredient, Recipe, Tag
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from recipes.models import Recipe, Tag
 
 
 class RecipeFilter(django_filters.FilterSet):
+    """Фильтры ленты рецептов.
+
+    Флаги is_favorited и is_in_shopping_cart фильтруют по аннотациям
+    RecipeQuerySet.for_feed, теги проверяются подзапросом EXISTS,
+    поэтому фильтры комбинируются без JOIN и DISTINCT.
+    """
+
     tags = django_filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
         to_field_name='slug',
+        method='filter_tags',
     )
     is_favorited = django_filters.NumberFilter(
         method='get_is_favorited'
@@ -24,29 +37,101 @@ class RecipeFilter(django_filters.FilterSet):
             'is_in_shopping_cart'
         )
 
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter_tags(value)
+
     def get_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated and value:
-            return queryset.filter(
-                favorite__user=user,
-                is_favorited=True,
-            )
-        return Recipe.objects.all()
+        if value:
+            return queryset.filter(is_favorited=True)
+        return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if value and user.is_authenticated:
-            return queryset.filter(
-                shopping_cart__user=user,
-                is_in_shopping_cart=True,
-            )
-        return Recipe.objects.all()
+        if value:
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
 
 
-class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(field_name='name',
-                                     lookup_expr='istartswith')
+class NameSearchFilter(BaseFilterBackend):
+    """Поиск по подстроке в поле name через параметр ?search=.
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    На PostgreSQL используются индексы pg_trgm: совпадение по подстроке
+    или по триграммному сходству (опечатки), результаты ранжируются
+    по сходству. На SQLite поиск идёт по FTS5-таблице <table>_fts
+    с триграммным токенайзером. Таблицы и индексы создаёт миграция
+    recipes.0007_name_search_indexes.
+    """
+
+    search_param = 'search'
+    # FTS5 trigram не находит строки короче трёх символов.
+    fts_min_length = 3
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            return self.filter_postgresql(queryset, term)
+        if vendor == 'sqlite' and len(term) >= self.fts_min_length:
+            return self.filter_sqlite(queryset, term)
+        return queryset.filter(name__icontains=term)
+
+    @staticmethod
+    def filter_postgresql(queryset, term):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.filter(
+            Q(name__icontains=term) | Q(name__trigram_similar=term)
+        ).annotate(
+            search_rank=TrigramSimilarity('name', term)
+        ).order_by('-search_rank', *ordering)
+
+    @staticmethod
+    def filter_sqlite(queryset, term):
+        table = f'{queryset.model._meta.db_table}_fts'
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (phrase,)
+        ))
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка ленты параметром ?ordering=, например -favorites_count.
+
+    К выбранному полю добавляется id того же направления: порядок
+    страниц стабилен при равных значениях и совпадает с индексами
+    recipe_favorites_count_id_idx и recipe_pub_date_id_idx. Без
+    параметра queryset не пересортировывается (Meta.ordering или ранг
+    поиска), а курсорной пагинации отдаётся default_ordering.
+    """
+
+    ordering_fields = ('favorites_count', 'pub_date')
+    default_ordering = ('-pub_date', '-id')
+
+    def get_requested_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params:
+            return None
+        ordering = self.remove_invalid_fields(
+            queryset,
+            [param.strip() for param in params.split(',')],
+            view,
+            request,
+        )
+        if not ordering:
+            return None
+        tiebreaker = '-id' if ordering[0].startswith('-') else 'id'
+        return [*ordering, tiebreaker]
+
+    def get_ordering(self, request, queryset, view):
+        return (
+            self.get_requested_ordering(request, queryset, view)
+            or list(self.default_ordering)
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_requested_ordering(request, queryset, view)
+        if ordering:
+            return queryset.order_by(*ordering)
+        return queryset
@@ -0,0 +1,452 @@
+import base64
+import io
+import json
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+
+from api.pagination import RecipeCursorPagination
+
+from recipes.management.commands.seed_benchmark import (
+    CART_SIZES,
+    EMAIL_DOMAIN,
+    PASSWORD,
+)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+def percentile(values, fraction):
+    """Значение по методу ближайшего ранга в отсортированном списке."""
+    return values[min(len(values) - 1, int(round(fraction * len(values))))]
+
+
+def explain(sql):
+    """План запроса: EXPLAIN QUERY PLAN на SQLite, EXPLAIN на PostgreSQL."""
+    prefix = 'EXPLAIN'
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}')
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'orange').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Задержки p50/p95 и число SQL-запросов для маршрутов api.urls '
+        'на данных seed_benchmark'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--only', help='Подстрока имени сценария для фильтрации'
+        )
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Пиковая память запроса по tracemalloc (замедляет запросы)',
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Планы SELECT-запросов сценария: использование индексов',
+        )
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего запуска для сравнения'
+        )
+
+    def handle(self, **options):
+        self.options = options
+        user = User.objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).annotate(total=Count('follower')).order_by('-total').first()
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('Сначала выполните manage.py seed_benchmark')
+        admin, _ = User.objects.get_or_create(
+            email=f'admin@{EMAIL_DOMAIN}',
+            defaults={
+                'username': 'benchmark-admin', 'first_name': 'Админ',
+                'last_name': 'Бенчмарк', 'is_staff': True,
+            },
+        )
+        self.user = user
+        self.clients = {
+            'anon': Client(),
+            'user': self.get_client(user),
+            'admin': self.get_client(admin),
+        }
+        for cart_user in User.objects.filter(
+            email__in=[f'cart{size}@{EMAIL_DOMAIN}' for size in CART_SIZES]
+        ):
+            self.clients[cart_user.email.split('@')[0]] = self.get_client(
+                cart_user
+            )
+        with override_settings(
+            ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS]
+        ):
+            results = {
+                name: self.measure(name, *scenario)
+                for name, scenario in self.get_scenarios().items()
+                if not options['only'] or options['only'] in name
+            }
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'django': django.get_version(),
+                    'recipes': Recipe.objects.count(),
+                    'cold': options['cold'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def get_client(user):
+        token, _ = Token.objects.get_or_create(user=user)
+        return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @staticmethod
+    def get_cursor_path(offset):
+        """Путь курсорной страницы, идущей после offset рецептов ленты."""
+        pagination = RecipeCursorPagination()
+        pagination.base_url = '/api/recipes/'
+        position = None
+        if offset:
+            position = str(Recipe.objects.order_by(
+                *pagination.ordering
+            ).values_list('pub_date', flat=True)[offset - 1])
+        return pagination.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
+
+    def get_scenarios(self):
+        """Сценарий: (клиент, метод, путь, данные, подготовка).
+
+        Для изменяющих запросов подготовка приводит данные в исходное
+        состояние, её запросы не учитываются.
+        """
+        recipe = Recipe.objects.exclude(author=self.user).first()
+        author = recipe.author
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        ingredients = list(Ingredient.objects.all()[:12])
+        image = make_image()
+        user_client = self.clients['user']
+
+        def reset_favorite():
+            recipe.favorite.filter(user=self.user).delete()
+
+        def add_favorite():
+            user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+
+        def reset_cart():
+            recipe.shopping_cart.filter(user=self.user).delete()
+
+        def add_cart():
+            user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+
+        def reset_subscription():
+            self.user.follower.filter(author=author).delete()
+
+        def add_subscription():
+            user_client.post(f'/api/users/{author.pk}/subscribe/')
+
+        def reset_recipe():
+            Recipe.objects.filter(name='Бенчмарк: новый рецепт').delete()
+
+        def login():
+            self.clients['anon'].post(
+                '/api/auth/token/login/',
+                {'email': self.user.email, 'password': PASSWORD},
+            )
+            token = Token.objects.get(user=self.user)
+            self.clients['logout'] = Client(
+                HTTP_AUTHORIZATION=f'Token {token.key}'
+            )
+
+        def recipe_ingredients(items, amount):
+            return [{'id': item.pk, 'amount': amount} for item in items]
+
+        original_recipe = json.dumps({
+            'name': 'Бенчмарк: изменяемый рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [tag.pk],
+            'ingredients': recipe_ingredients(ingredients[:10], 10),
+        })
+        # Часть ингредиентов без изменений, часть с новым количеством,
+        # часть удалена и добавлена: все ветки диффа update_ingredients.
+        changed_recipe = json.dumps({
+            'cooking_time': 20,
+            'ingredients': [
+                *recipe_ingredients(ingredients[:5], 10),
+                *recipe_ingredients(ingredients[5:8], 20),
+                *recipe_ingredients(ingredients[10:], 10),
+            ],
+        })
+        edited = Recipe.objects.filter(
+            author=self.user, name='Бенчмарк: изменяемый рецепт'
+        ).first()
+        if edited is None:
+            edited = Recipe.objects.get(pk=user_client.post(
+                '/api/recipes/', original_recipe,
+                content_type='application/json',
+            ).json()['id'])
+
+        def reset_edited():
+            user_client.patch(
+                f'/api/recipes/{edited.pk}/', original_recipe,
+                content_type='application/json',
+            )
+
+        # Страница 10 000 в обоих режимах пагинации, на небольших
+        # наборах данных - последняя страница.
+        deep_page = max(1, min(
+            10000, Recipe.objects.count() // settings.PAGINATION_PAGE_SIZE
+        ))
+        new_recipe = json.dumps({
+            'name': 'Бенчмарк: новый рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+        })
+        scenarios = {
+            'users-list anon': ('anon', 'get', '/api/users/'),
+            'users-list': ('user', 'get', '/api/users/'),
+            'users-detail': ('user', 'get', f'/api/users/{author.pk}/'),
+            'users-me': ('user', 'get', '/api/users/me/'),
+            'users-subscriptions': (
+                'user', 'get', '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'users-subscribe POST': (
+                'user', 'post', f'/api/users/{author.pk}/subscribe/',
+                None, reset_subscription,
+            ),
+            'users-subscribe DELETE': (
+                'user', 'delete', f'/api/users/{author.pk}/subscribe/',
+                None, add_subscription,
+            ),
+            'tags-list': ('anon', 'get', '/api/tags/'),
+            'tags-detail': ('anon', 'get', f'/api/tags/{tag.pk}/'),
+            'ingredients-list': ('anon', 'get', '/api/ingredients/'),
+            'ingredients-list name': (
+                'anon', 'get', '/api/ingredients/?name=мук'
+            ),
+            'ingredients-list search': (
+                'anon', 'get', '/api/ingredients/?search=мука'
+            ),
+            'ingredients-list search substring': (
+                'anon', 'get', '/api/ingredients/?search=ука'
+            ),
+            'ingredients-detail': (
+                'anon', 'get', f'/api/ingredients/{ingredient.pk}/'
+            ),
+            'recipes-list anon': ('anon', 'get', '/api/recipes/'),
+            'recipes-list': ('user', 'get', '/api/recipes/'),
+            'recipes-list page 10': (
+                'user', 'get', '/api/recipes/?page=10'
+            ),
+            'recipes-list cursor': (
+                'user', 'get', '/api/recipes/?pagination=cursor'
+            ),
+            f'recipes-list page {deep_page}': (
+                'user', 'get', f'/api/recipes/?page={deep_page}'
+            ),
+            f'recipes-list cursor page {deep_page}': (
+                'user', 'get', self.get_cursor_path(
+                    (deep_page - 1) * settings.PAGINATION_PAGE_SIZE
+                ),
+            ),
+            'recipes-list tags': (
+                'user', 'get', f'/api/recipes/?tags={tag.slug}'
+            ),
+            'recipes-list author': (
+                'user', 'get', f'/api/recipes/?author={author.pk}'
+            ),
+            'recipes-list is_favorited': (
+                'user', 'get', '/api/recipes/?is_favorited=1'
+            ),
+            'recipes-list is_in_shopping_cart': (
+                'user', 'get', '/api/recipes/?is_in_shopping_cart=1'
+            ),
+            'recipes-list popular': (
+                'user', 'get', '/api/recipes/?ordering=-favorites_count'
+            ),
+            'recipes-feed': ('user', 'get', '/api/recipes/feed/'),
+            'recipes-list search': (
+                'user', 'get', '/api/recipes/?search=Бенчмарк'
+            ),
+            # Подстрока и опечатка в названии: с --explain видно, что
+            # поиск идёт по FTS5 или по триграммным индексам.
+            'recipes-list search substring': (
+                'user', 'get', '/api/recipes/?search=нчмарк 77'
+            ),
+            'recipes-list search typo': (
+                'user', 'get', '/api/recipes/?search=Бенчмрак 77'
+            ),
+            'recipes-detail anon': (
+                'anon', 'get', f'/api/recipes/{recipe.pk}/'
+            ),
+            'recipes-detail': ('user', 'get', f'/api/recipes/{recipe.pk}/'),
+            'recipes-list POST': (
+                'user', 'post', '/api/recipes/', new_recipe, reset_recipe,
+            ),
+            'recipes-detail PATCH': (
+                'user', 'patch', f'/api/recipes/{edited.pk}/',
+                changed_recipe, reset_edited,
+            ),
+            'recipes-favorite POST': (
+                'user', 'post', f'/api/recipes/{recipe.pk}/favorite/',
+                None, reset_favorite,
+            ),
+            'recipes-favorite DELETE': (
+                'user', 'delete', f'/api/recipes/{recipe.pk}/favorite/',
+                None, add_favorite,
+            ),
+            'recipes-shopping-cart POST': (
+                'user', 'post', f'/api/recipes/{recipe.pk}/shopping_cart/',
+                None, reset_cart,
+            ),
+            'recipes-shopping-cart DELETE': (
+                'user', 'delete', f'/api/recipes/{recipe.pk}/shopping_cart/',
+                None, add_cart,
+            ),
+            'recipes-download-shopping-cart': (
+                'user', 'get', '/api/recipes/download_shopping_cart/'
+            ),
+            'recipes-download-shopping-cart csv': (
+                'user', 'get',
+                '/api/recipes/download_shopping_cart/?format=csv',
+            ),
+            'auth token logout': (
+                'logout', 'post', '/api/auth/token/logout/', None, login,
+            ),
+            'cache-stats': ('admin', 'get', '/api/cache/stats/'),
+        }
+        # Выгрузка корзин из 10, 100 и 1000 рецептов: TTFB и память.
+        for size in CART_SIZES:
+            if f'cart{size}' in self.clients:
+                for file_format in ('txt', 'csv', 'json'):
+                    scenarios[
+                        f'recipes-download-shopping-cart {file_format} {size}'
+                    ] = (
+                        f'cart{size}', 'get',
+                        '/api/recipes/download_shopping_cart/'
+                        f'?format={file_format}',
+                    )
+        return scenarios
+
+    def measure(self, name, client_name, method, path, data=None,
+                prepare=None):
+        latencies, first_bytes, peaks, queries = [], [], [], []
+        status = None
+        # Запросы прогона с наибольшим их числом: при попадании в кеш
+        # ответов остальные прогоны не доходят до поиска.
+        captured = []
+        for number in range(self.options['warmup'] + self.options['repeat']):
+            if prepare is not None:
+                prepare()
+            if self.options['cold']:
+                cache.clear()
+            client = self.clients[client_name]
+            kwargs = {}
+            if data is not None:
+                kwargs = {'data': data, 'content_type': 'application/json'}
+            if self.options['memory']:
+                tracemalloc.start()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, **kwargs)
+                first_byte = None
+                if response.streaming:
+                    # Тело потокового ответа формируется при чтении.
+                    for chunk in response.streaming_content:
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - started
+                elapsed = time.perf_counter() - started
+            if self.options['memory']:
+                peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+            status = response.status_code
+            if len(context) > len(captured):
+                captured = context.captured_queries
+            if number >= self.options['warmup']:
+                latencies.append(elapsed * 1000)
+                queries.append(len(context))
+                if first_byte is not None:
+                    first_bytes.append(first_byte * 1000)
+        latencies.sort()
+        first_bytes.sort()
+        result = {
+            'method': method.upper(),
+            'path': path,
+            'status': status,
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'queries': max(queries),
+        }
+        if first_bytes:
+            result['ttfb_p50_ms'] = round(percentile(first_bytes, 0.5), 2)
+        if peaks:
+            result['peak_kib'] = round(max(peaks))
+        if self.options['explain']:
+            result['plans'] = [
+                explain(query['sql']) for query in captured
+                if query['sql'].startswith('SELECT')
+            ]
+        return result
+
+    def report(self, results):
+        previous = {}
+        if self.options['compare']:
+            with open(self.options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+        self.stdout.write(
+            f'{"сценарий":40} {"код":>4} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"SQL":>4}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:40} {result["status"]:>4} {result["p50_ms"]:>9.2f} '
+                f'{result["p95_ms"]:>9.2f} {result["queries"]:>4}'
+            )
+            if 'ttfb_p50_ms' in result:
+                line += f'  TTFB {result["ttfb_p50_ms"]:.2f} мс'
+            if 'peak_kib' in result:
+                line += f'  память {result["peak_kib"]} КиБ'
+            old = previous.get(name)
+            if old:
+                line += (
+                    f'  p50 {result["p50_ms"] - old["p50_ms"]:+.2f} '
+                    f'SQL {result["queries"] - old["queries"]:+d}'
+                )
+            self.stdout.write(line)
+            for plan in result.get('plans', ()):
+                self.stdout.write('    ' + '\n    '.join(plan))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    help = 'Сравнение накладных расходов аутентификации по токену'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, **options):
+        token = Token.objects.first()
+        if token is None:
+            raise CommandError('Нет ни одного токена')
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        token_cache.clear()
+        for authentication in (
+            TokenAuthentication(), CachedTokenAuthentication()
+        ):
+            iterations = options['iterations']
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    authentication.authenticate(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{type(authentication).__name__}: '
+                f'{elapsed / iterations * 1e6:.1f} мкс/запрос, '
+                f'запросов к БД {len(queries) / iterations:.3f}'
+            )
@@ -0,0 +1,116 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+def count_connections():
+    """Число соединений с текущей БД по pg_stat_activity."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT count(*) FROM pg_stat_activity '
+            'WHERE datname = current_database()'
+        )
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест запущенного сервера: задержки и соединения с БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url', nargs='+',
+            help=(
+                'Например http://localhost:8000. Несколько адресов, '
+                'например серверы в режимах wsgi и asgi, проверяются '
+                'по очереди с одинаковой нагрузкой'
+            ),
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Путь API, можно указать несколько раз',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--token', help='Токен для заголовка Authorization'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Тайм-аут запроса в секундах',
+        )
+
+    def handle(self, **options):
+        paths = options['path'] or ['/api/recipes/', '/api/tags/']
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        for url in options['url']:
+            if len(options['url']) > 1:
+                self.stdout.write(url)
+            self.run(url, paths, headers, options)
+
+    def run(self, url, paths, headers, options):
+        connections = []
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                connections.append(count_connections())
+                done.wait(0.2)
+
+        def fetch(number):
+            path_url = url.rstrip('/') + quote(
+                paths[number % len(paths)], safe='/?=&'
+            )
+            started = time.perf_counter()
+            try:
+                with urlopen(
+                    Request(path_url, headers=headers),
+                    timeout=options['timeout'],
+                ) as response:
+                    response.read()
+            except OSError:
+                # URLError, разрыв соединения (например, при перезапуске
+                # воркера по max_requests) и тайм-аут считаются ошибками.
+                return None
+            return time.perf_counter() - started
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+
+        latencies = sorted(
+            latency for latency in results if latency is not None
+        )
+        self.stdout.write(
+            f'Запросов: {len(results)}, ошибок: '
+            f'{len(results) - len(latencies)}, '
+            f'{len(results) / elapsed:.0f} в секунду'
+        )
+        if len(latencies) < 2:
+            return
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'p50 {quantiles[49] * 1000:.1f} мс, '
+            f'p95 {quantiles[94] * 1000:.1f} мс, '
+            f'max {latencies[-1] * 1000:.1f} мс'
+        )
+        counts = [count for count in connections if count is not None]
+        if counts:
+            self.stdout.write(
+                f'Соединений с БД: максимум {max(counts)}, '
+                f'в среднем {statistics.mean(counts):.1f}'
+            )
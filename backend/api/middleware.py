@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+current_stats = ContextVar('current_stats', default=None)
+
+METRICS = (
+    ('requests_total', 'counter', 'Число запросов'),
+    ('db_queries_total', 'counter', 'Число SQL-запросов'),
+    ('db_seconds_total', 'counter', 'Время SQL-запросов'),
+    ('app_seconds_total', 'counter', 'Время представления без SQL'),
+    ('serializer_seconds_total', 'counter', 'Время сериализации без SQL'),
+    ('response_bytes_total', 'counter', 'Размер ответов'),
+    ('query_budget_exceeded_total', 'counter', 'Превышения бюджета'),
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем QUERY_BUDGETS."""
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def install_serializer_timer():
+    """Учитывает в RequestStats время свойства data сериализаторов DRF.
+
+    Считается только внешний вызов data: вложенные сериализаторы
+    и RecipeFullSerializer внутри RecipeWriteSerializer входят в него.
+    Время SQL-запросов сериализации вычитается, оно уже есть в db.
+    """
+    for serializer_class in (
+        serializers.BaseSerializer,
+        serializers.Serializer,
+        serializers.ListSerializer,
+    ):
+        data = serializer_class.__dict__['data']
+        if not getattr(data.fget, 'timed', False):
+            serializer_class.data = property(timed_data(data.fget))
+
+
+def timed_data(get_data):
+    def data(serializer):
+        stats = current_stats.get()
+        if stats is None or stats.serializing:
+            return get_data(serializer)
+        stats.serializing = True
+        db_time = stats.db_time
+        started = time.perf_counter()
+        try:
+            return get_data(serializer)
+        finally:
+            stats.serializing = False
+            stats.serializer_time += max(
+                time.perf_counter() - started - (stats.db_time - db_time), 0
+            )
+    data.timed = True
+    return data
+
+
+def install_query_recorder():
+    """Подключает record_query к соединениям текущего потока.
+
+    Соединение, общее для нескольких потоков (как in-memory SQLite
+    у тестового live-сервера), уже может содержать обёртку другого
+    запроса: повторная обёртка посчитала бы каждый запрос дважды.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            stack.enter_context(connection.execute_wrapper(record_query))
+    return stack
+
+
+class Metrics:
+    """Накопленные метрики процесса по именам представлений."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(lambda: defaultdict(float))
+
+    def add(self, view, **values):
+        with self.lock:
+            for name, value in values.items():
+                self.values[name][view] += value
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, kind, description in METRICS:
+                lines.append(f'# HELP foodgram_{name} {description}')
+                lines.append(f'# TYPE foodgram_{name} {kind}')
+                for view, value in sorted(self.values[name].items()):
+                    lines.append(
+                        f'foodgram_{name}{{view="{view}"}} {value:g}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class ProfilingMiddleware:
+    """Число и время SQL-запросов, время сериализации и размер ответа.
+
+    Значения добавляются в заголовок Server-Timing и в метрики
+    api.views.MetricsView по имени представления. Для представлений
+    из QUERY_BUDGETS превышение бюджета пишется в лог или, при
+    QUERY_BUDGET_ACTION = 'raise', вызывает QueryBudgetExceeded.
+    У потоковых ответов учитываются только запросы до начала передачи
+    тела, размер тела добавляется в метрики после его отправки.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_serializer_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with install_query_recorder():
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        # ORM асинхронных представлений работает в потоке
+        # ThreadSensitiveContext запроса: обёртка ставится в нём.
+        recorder = await sync_to_async(install_query_recorder)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.close)()
+            current_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    @staticmethod
+    def get_view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.url_name or match.view_name or 'unnamed'
+
+    @staticmethod
+    def count_streaming_size(response, view):
+        """Подменяет тело потокового ответа счётчиком отправленных байт."""
+        content = response.streaming_content
+
+        def add(size):
+            metrics.add(view, response_bytes_total=size)
+
+        if response.is_async:
+            async def counted():
+                size = 0
+                try:
+                    async for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    add(size)
+        else:
+            def counted():
+                size = 0
+                try:
+                    for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    add(size)
+        response.streaming_content = counted()
+
+    def finish(self, request, response, stats, started):
+        total = time.perf_counter() - started
+        app_time = max(total - stats.db_time, 0)
+        view = self.get_view_name(request)
+        if response.streaming:
+            size = 0
+            self.count_streaming_size(response, view)
+        else:
+            size = len(response.content)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} SQL", '
+            f'ser;dur={stats.serializer_time * 1000:.1f}, '
+            f'app;dur={app_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        budget = settings.QUERY_BUDGETS.get(
+            f'{request.method} {view}', settings.QUERY_BUDGETS.get(view)
+        )
+        exceeded = budget is not None and stats.queries > budget
+        metrics.add(
+            view,
+            requests_total=1,
+            db_queries_total=stats.queries,
+            db_seconds_total=stats.db_time,
+            app_seconds_total=app_time,
+            serializer_seconds_total=stats.serializer_time,
+            response_bytes_total=size,
+            query_budget_exceeded_total=exceeded,
+        )
+        if exceeded:
+            message = (
+                f'{view}: {stats.queries} SQL-запросов при бюджете {budget}'
+            )
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -1,7 +1,66 @@
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from foodgram.pagination import CountStrategyPaginator
 
 
 class LimitPagination(PageNumberPagination):
     page_size = settings.PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+    django_paginator_class = CountStrategyPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_approximate'] = (
+            self.page.paginator.is_count_approximate
+        )
+        return response
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация рецептов по (pub_date, id) без COUNT и OFFSET.
+
+    Ответ сохраняет форму LimitPagination, count всегда null.
+    """
+
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': None,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class RecipePagination(LimitPagination):
+    """Постраничная пагинация с включаемым курсорным режимом.
+
+    Курсорный режим включается параметром ?pagination=cursor
+    и сохраняется в ссылках next/previous вместе с ?cursor=.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
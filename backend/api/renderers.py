@@ -0,0 +1,127 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+
+from django.http import Http404
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListNegotiation(BaseContentNegotiation):
+    """Выбор формата списка покупок только по параметру ?format=.
+
+    Заголовок Accept игнорируется, чтобы клиенты без параметра
+    по-прежнему получали текстовый файл.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query = format_suffix or request.GET.get('format')
+        if not format_query:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == format_query:
+                return renderer, renderer.media_type
+        raise Http404
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер списка покупок.
+
+    Документ формируется построчно методами stream() и astream()
+    из begin(), line() и end(); render() используется только для
+    ответов с ошибками. Подклассы определяют line().
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def begin(self):
+        return ''
+
+    @abstractmethod
+    def line(self, ingredient, index):
+        """Строка документа для ingredient с порядковым номером index."""
+
+    def end(self, count):
+        return ''
+
+    def stream(self, ingredients):
+        yield self.begin()
+        count = 0
+        for count, ingredient in enumerate(ingredients, 1):
+            yield self.line(ingredient, count)
+        yield self.end(count)
+
+    async def astream(self, ingredients):
+        yield self.begin()
+        count = 0
+        async for ingredient in ingredients:
+            count += 1
+            yield self.line(ingredient, count)
+        yield self.end(count)
+
+    @staticmethod
+    def get_row(ingredient):
+        return (
+            ingredient['ingredient__name'],
+            ingredient['ingredient_amount'],
+            ingredient['ingredient__measurement_unit'],
+        )
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def begin(self):
+        return 'Список покупок:\n'
+
+    def line(self, ingredient, index):
+        name, amount, unit = self.get_row(ingredient)
+        return f'{name} - {amount}, {unit}\n'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    writer = csv.writer(Echo())
+
+    def begin(self):
+        return self.writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+
+    def line(self, ingredient, index):
+        return self.writer.writerow(self.get_row(ingredient))
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def begin(self):
+        return '['
+
+    def line(self, ingredient, index):
+        name, amount, unit = self.get_row(ingredient)
+        return (',' if index > 1 else '') + json.dumps(
+            {'name': name, 'amount': amount, 'measurement_unit': unit},
+            ensure_ascii=False,
+        )
+
+    def end(self, count):
+        return ']'
@@ -1,29 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db.models import Manager, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.fields import HiddenField
 from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.images import schedule_thumbnails
 from recipes.models import (
     Favorite,
     Ingredient,
     IngredientAmount,
     Recipe,
+    Revision,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from users.models import Subscription, User
 
+FRAGMENT_NAMESPACES = ('tags', 'ingredients', 'users')
+
+
+def get_subscribed_ids(context):
+    """Id авторов, на которых подписан пользователь запроса.
+
+    Множество загружается одним запросом и сохраняется в объекте запроса,
+    поэтому все сериализаторы в рамках запроса используют его повторно.
+    """
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return frozenset()
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'subscribed_ids'):
+        request.subscribed_ids = frozenset(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request.subscribed_ids
+
+
+def get_fragment_stamps(context):
+    """Штампы Revision разделов, от которых зависят фрагменты рецептов.
+
+    Штампы хранятся в базе, поэтому правка тега или пользователя
+    меняет ключи фрагментов во всех процессах; как и get_subscribed_ids,
+    загружаются один раз за запрос.
+    """
+    request = context.get('request')
+    request = getattr(request, '_request', request)
+    if request is None:
+        return Revision.objects.stamps(*FRAGMENT_NAMESPACES)
+    if not hasattr(request, 'fragment_stamps'):
+        request.fragment_stamps = Revision.objects.stamps(
+            *FRAGMENT_NAMESPACES
+        )
+    return request.fragment_stamps
+
+
+def set_prefetched(instance, name, objects):
+    """Заполняет кеш prefetch_related связи name готовыми объектами."""
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault('_prefetched_objects_cache', {})[
+        name
+    ] = queryset
+
+
+class ThumbnailField(serializers.ImageField):
+    """URL миниатюры рецепта, пока её нет - URL оригинала."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return super().to_representation(recipe.image_thumb or recipe.image)
+
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор модели Recipe."""
 
     image = Base64ImageField()
+    image_thumb = ThumbnailField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumb', 'cooking_time')
 
 
 class UserGetSerializer(serializers.ModelSerializer):
@@ -39,43 +106,21 @@ class UserGetSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, author):
-        request = self.context.get('request')
-        return (request and request.user.is_authenticated
-                and request.user.follower.filter(author=author).exists())
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return author.id in get_subscribed_ids(self.context)
 
 
-class SubscriptionUserSerializer(serializers.ModelSerializer):
+class SubscriptionUserSerializer(UserGetSerializer):
     """Сериализатор подписки пользователя."""
 
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
+    recipes = RecipeShortSerializer(
+        source='recipes_preview', many=True, read_only=True
     )
-    is_subscribed = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
-    class Meta:
-        model = User
-        fields = (
-            'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes', 'recipes_count'
-        )
-
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
-        serializer = RecipeShortSerializer(
-            recipes, many=True, read_only=True
-        )
-        return serializer.data
-
-    def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (request and request.user.is_authenticated
-                and request.user.follower.filter(author=obj).exists())
+    class Meta(UserGetSerializer.Meta):
+        fields = UserGetSerializer.Meta.fields + ('recipes', 'recipes_count')
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -134,14 +179,38 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class AddIngredientListSerializer(serializers.ListSerializer):
+    """Список ингредиентов рецепта, загружаемых одним запросом."""
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = Ingredient.objects.in_bulk(
+            {item['id'] for item in items}
+        )
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+        errors = [
+            {} if item['id'] in ingredients
+            else {'id': [message.format(pk_value=item['id'])]}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in items:
+            item['id'] = ingredients[item['id']]
+        return items
+
+
 class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(write_only=True,
                                       min_value=1, max_value=32000)
 
     class Meta:
         model = IngredientAmount
         fields = ('id', 'amount')
+        list_serializer_class = AddIngredientListSerializer
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -170,75 +239,154 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 amount=ingredient.get('amount')
             )
             ingredients_all.append(new_ingredient)
-        IngredientAmount.objects.bulk_create(ingredients_all)
+        return IngredientAmount.objects.bulk_create(ingredients_all)
+
+    def update_tags(self, instance, tags):
+        current = {tag.id for tag in instance.tags.all()}
+        new = {tag.id for tag in tags}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+        set_prefetched(
+            instance, 'tags', sorted(tags, key=lambda tag: tag.name)
+        )
+
+    def update_ingredients(self, instance, ingredients):
+        """Применяет к рецепту только изменившиеся ингредиенты.
+
+        Возвращает изменения количеств {ingredient_id: delta}
+        для сводных списков покупок. Удалённые ингредиенты вычитает
+        из списков сигнал pre_delete (recipes.signals).
+        """
+        current = {
+            item.ingredient_id: item
+            for item in instance.ingredients_amount.all()
+        }
+        items, to_create, to_update, deltas = [], [], [], {}
+        for ingredient in ingredients:
+            obj, amount = ingredient['id'], ingredient['amount']
+            item = current.pop(obj.id, None)
+            if item is None:
+                item = IngredientAmount(
+                    recipe=instance, ingredient=obj, amount=amount
+                )
+                to_create.append(item)
+                deltas[obj.id] = amount
+            elif item.amount != amount:
+                deltas[obj.id] = amount - item.amount
+                item.amount = amount
+                to_update.append(item)
+            item.ingredient = obj
+            items.append(item)
+        if current:
+            IngredientAmount.objects.filter(
+                pk__in=[item.pk for item in current.values()]
+            ).delete()
+        IngredientAmount.objects.bulk_create(to_create)
+        IngredientAmount.objects.bulk_update(to_update, ('amount',))
+        set_prefetched(
+            instance, 'ingredients_amount',
+            sorted(items, key=lambda item: item.pk)
+        )
+        return deltas
 
     @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
+        schedule_thumbnails([recipe.pk])
         recipe.tags.set(tags)
-        self.create_bulk_ingredients(recipe, ingredients)
+        set_prefetched(recipe, 'tags', sorted(tags, key=lambda tag: tag.name))
+        set_prefetched(
+            recipe, 'ingredients_amount',
+            self.create_bulk_ingredients(recipe, ingredients)
+        )
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_bulk_ingredients(recipe=instance,
-                                     ingredients=ingredients)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            ShoppingListItem.objects.add_amounts(
+                instance.shopping_cart.values_list('user_id', flat=True),
+                self.update_ingredients(instance, ingredients),
+            )
+        if 'image' in validated_data:
+            # До готовности новой миниатюры отдаётся оригинал.
+            old_thumb = instance.image_thumb
+            if old_thumb:
+                transaction.on_commit(
+                    lambda: old_thumb.storage.delete(old_thumb.name)
+                )
+            validated_data['image_thumb'] = ''
+            schedule_thumbnails([instance.pk])
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        queryset = Recipe.objects.add_user_annotations(
-            self.context['request'].user.id
-        )
-        recipe = get_object_or_404(queryset, id=instance.id)
-
-        return RecipeFullSerializer(
-            recipe, context={'request': self.context.get('request')}
-        ).data
+        return RecipeFullSerializer(instance, context=self.context).data
 
     def validate(self, data):
         cooking_time = data.get('cooking_time')
-        if cooking_time <= 0:
+        if cooking_time is not None and cooking_time <= 0:
             raise serializers.ValidationError(
                 {
                     'error': 'Время приготовления не может быть меньше минуты'
                 }
             )
-        tags = data.get('tags')
-        if not tags:
-            raise serializers.ValidationError(
-                'Нужно указать хотя бы 1 тег.'
-            )
-        tags_set = set(tags)
-        if len(tags) != len(tags_set):
-            raise serializers.ValidationError(
-                'Такой тег уже существует, добавьте новый!'
-            )
+        if 'tags' in data or not self.partial:
+            tags = data.get('tags')
+            if not tags:
+                raise serializers.ValidationError(
+                    'Нужно указать хотя бы 1 тег.'
+                )
+            tags_set = set(tags)
+            if len(tags) != len(tags_set):
+                raise serializers.ValidationError(
+                    'Такой тег уже существует, добавьте новый!'
+                )
+
+        if 'ingredients' in data or not self.partial:
+            ingredients_list = data.get('ingredients', [])
+            if len(ingredients_list) < 1:
+                raise serializers.ValidationError({
+                    'error': 'Список ингредиентов не должен быть пустым'
+                })
+
+            ingredient_ids = [
+                ingredient['id'] for ingredient in ingredients_list
+            ]
+            if len(ingredient_ids) != len(set(ingredient_ids)):
+                raise serializers.ValidationError(
+                    {'error': 'Ингредиенты не должны повторяться'}
+                )
+        return data
 
-        ingredients_list = data.get('ingredients', [])
-        if len(ingredients_list) < 1:
-            raise serializers.ValidationError({
-                'error': 'Список ингредиентов не должен быть пустым'
-            })
 
-        ingredient_ids = [ingredient['id'] for ingredient in ingredients_list]
-        if len(ingredient_ids) != len(set(ingredient_ids)):
-            raise serializers.ValidationError(
-                {'error': 'Ингредиенты не должны повторяться'}
-            )
-        return data
+class RecipeListSerializer(serializers.ListSerializer):
+    """Страница рецептов, собранная через кеш фрагментов."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_many(list(recipes))
 
 
 class RecipeFullSerializer(serializers.ModelSerializer):
-    """Сериализатор модели Recipe для GET-запросов."""
+    """Сериализатор модели Recipe для GET-запросов.
+
+    Общая для всех пользователей часть ответа кешируется по рецепту
+    с ключом от updated_at. Признаки is_favorited, is_in_shopping_cart
+    и author.is_subscribed накладываются поверх из аннотаций
+    RecipeQuerySet.for_feed. Теги и ингредиенты загружаются одним
+    prefetch только для рецептов, которых нет в кеше.
+    """
 
     image = Base64ImageField()
+    image_thumb = ThumbnailField()
     tags = TagSerializer(many=True)
     author = UserGetSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(
@@ -250,10 +398,71 @@ class RecipeFullSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'name', 'image', 'cooking_time', 'tags',
+            'id', 'name', 'image', 'image_thumb', 'cooking_time', 'tags',
             'author', 'ingredients', 'text', 'is_favorited',
             'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        request = self.context.get('request')
+        prefix = 'recipe-fragment:{}:{}'.format(
+            request.get_host() if request else '',
+            ':'.join(
+                str(stamp.timestamp())
+                for stamp in get_fragment_stamps(self.context)
+            ),
+        )
+        keys = {
+            recipe.pk: f'{prefix}:{recipe.pk}:{recipe.updated_at.timestamp()}'
+            for recipe in recipes
+        }
+        fragments = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            prefetch_related_objects(
+                missing, *Recipe.objects.feed_prefetch()
+            )
+            created = {
+                keys[recipe.pk]: self.to_fragment(recipe)
+                for recipe in missing
+            }
+            cache.set_many(created, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(created)
+        return [
+            self.apply_overlay(fragments[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+    def to_fragment(self, recipe):
+        recipe.author.is_subscribed = False
+        fragment = dict(super().to_representation(recipe))
+        fragment.pop('is_favorited', None)
+        fragment.pop('is_in_shopping_cart', None)
+        fragment['author'] = dict(fragment['author'])
+        del fragment['author']['is_subscribed']
+        return fragment
+
+    def apply_overlay(self, fragment, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            is_subscribed = recipe.author_is_subscribed
+        else:
+            is_subscribed = recipe.author_id in get_subscribed_ids(
+                self.context
+            )
+        return {
+            **fragment,
+            'author': {**fragment['author'], 'is_subscribed': is_subscribed},
+            'is_favorited': getattr(recipe, 'is_favorited', False),
+            'is_in_shopping_cart': getattr(
+                recipe, 'is_in_shopping_cart', False
+            ),
+        }
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    Revision,
+    Tag,
+)
+from recipes.signals import bulk_changed
+from users.models import User
+
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .cache import bump_versions
+
+
+def bump_on_commit(*namespaces):
+    transaction.on_commit(lambda: bump_versions(*namespaces))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(bulk_changed, sender=Recipe)
+def invalidate_recipes(sender, **kwargs):
+    bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    Revision.objects.bump('tags')
+    bump_on_commit('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(bulk_changed, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    Revision.objects.bump('ingredients')
+    bump_on_commit('ingredients')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_users(sender, created=False, update_fields=None, **kwargs):
+    # У нового пользователя нет рецептов, а вход обновляет только
+    # last_login, который не попадает в ответы.
+    if created or (
+        update_fields is not None and set(update_fields) == {'last_login'}
+    ):
+        return
+    Revision.objects.bump('users')
+    bump_on_commit('users')
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # После delete() Django обнуляет pk, а pk токена - это его ключ.
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens(key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, created=False,
+                           update_fields=None, **kwargs):
+    # Смена пароля, деактивация и правка профиля меняют
+    # закешированного пользователя; last_login в кеше не важен.
+    if created or (
+        update_fields is not None and set(update_fields) == {'last_login'}
+    ):
+        return
+    transaction.on_commit(lambda: invalidate_user_tokens(instance.pk))
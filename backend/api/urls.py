@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (
     CustomUserViewSet,
     IngredientViewSet,
+    MetricsView,
     RecipeViewSet,
+    ResponseCacheStatsView,
     TagViewSet,
 )
 
@@ -17,6 +21,20 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
+    path('cache/stats/', ResponseCacheStatsView.as_view()),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.PROFILING_METRICS:
+    urlpatterns.insert(0, path('metrics/', MetricsView.as_view()))
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('tags/', async_views.tag_list),
+        path('ingredients/', async_views.ingredient_list),
+        path(
+            'recipes/download_shopping_cart/',
+            async_views.download_shopping_cart,
+        ),
+    ] + urlpatterns
@@ -1,26 +1,59 @@
-from django.db.models import BooleanField, Exists, OuterRef, Sum, Value
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    F,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from recipes.bulk import RecipeImporter, export_recipes
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
     Favorite,
     Ingredient,
-    IngredientAmount,
     Recipe,
+    Revision,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from users.models import Subscription, User
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPagination
+from .cache import (
+    AnonymousCacheMixin,
+    ConditionalGetMixin,
+    get_stats,
+    make_etag,
+)
+from .filters import NameSearchFilter, RecipeFilter, RecipeOrderingFilter
+from .middleware import metrics
+from .pagination import (
+    LimitPagination,
+    RecipeCursorPagination,
+    RecipePagination,
+)
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListNegotiation,
+    ShoppingListTextRenderer,
+)
 from .serializers import (
     FavoriteSerializer,
     IngredientSerializer,
@@ -31,6 +64,7 @@ from .serializers import (
     SubscriptionSerializer,
     SubscriptionUserSerializer,
     TagSerializer,
+    get_fragment_stamps,
 )
 
 
@@ -41,6 +75,40 @@ class CustomUserViewSet(UserViewSet):
     pagination_class = LimitPagination
     permission_classes = [IsAuthorOrReadOnly]
 
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if not limit:
+            return None
+        # isdigit() пропускает символы вроде '²', которые int() не берёт.
+        if not (limit.isascii() and limit.isdecimal()):
+            raise ValidationError(
+                {'recipes_limit': 'Укажите целое неотрицательное число.'}
+            )
+        return int(limit)
+
+    def annotate_subscriptions(self, authors):
+        """Авторы с числом рецептов и превью последних рецептов.
+
+        Превью ограничивается recipes_limit через ROW_NUMBER() по автору,
+        поэтому страница подписок загружается двумя запросами.
+        """
+        recipes = Recipe.objects.all()
+        limit = self.get_recipes_limit()
+        if limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).filter(row_number__lte=limit)
+        return authors.annotate(
+            recipes_count=Count('recipes'),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by(*User._meta.ordering).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
+        )
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -55,7 +123,12 @@ class CustomUserViewSet(UserViewSet):
                 data={'user': user.id, 'author': author.id}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            # Лента подписчика дополняется в post_save (recipes.signals).
+            with transaction.atomic():
+                serializer.save()
+            author = self.annotate_subscriptions(
+                User.objects.filter(id=author.id)
+            ).get()
             serializer_author = SubscriptionUserSerializer(
                 author, context={'request': request}
             )
@@ -64,7 +137,9 @@ class CustomUserViewSet(UserViewSet):
             )
 
         subscription = Subscription.objects.filter(user=user, author=author)
-        deleted = subscription.delete()
+        # Лента подписчика очищается в post_delete (recipes.signals).
+        with transaction.atomic():
+            deleted = subscription.delete()
 
         if deleted[0]:
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -80,8 +155,8 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticatedOrReadOnly]
     )
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(
-            following__user=request.user
+        subscriptions = self.annotate_subscriptions(
+            User.objects.filter(following__user=request.user)
         )
         page = self.paginate_queryset(subscriptions)
         serializer = SubscriptionUserSerializer(
@@ -90,55 +165,87 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogViewSet(
+    ConditionalGetMixin, AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet
+):
+    """Справочник с условными GET-запросами по штампу изменения."""
+
+    def get_validators(self, request, *args, **kwargs):
+        namespace, = self.cache_namespaces
+        stamp, = Revision.objects.stamps(namespace)
+        return make_etag(namespace, stamp.isoformat()), stamp
+
+
+class IngredientViewSet(CatalogViewSet):
     """Вьюсет для отображения ингредиентов."""
 
+    cache_namespaces = ('ingredients',)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = IngredientFilter
+    filter_backends = [NameSearchFilter]
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        # Ответ из индекса в памяти без кеша ответов, но с теми же
+        # ETag/Last-Modified, что и у асинхронного ingredient_list.
+        return self.get_conditional(
+            self.search_by_name, request, *args, **kwargs
+        )
 
+    def search_by_name(self, request, *args, **kwargs):
+        return Response(ingredient_index.search(
+            request.query_params['name'], settings.INGREDIENT_SEARCH_LIMIT
+        ))
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CatalogViewSet):
     """Вьюсет для отображения тегов."""
 
+    cache_namespaces = ('tags',)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin, AnonymousCacheMixin, viewsets.ModelViewSet
+):
     """Вьюсет для отображения рецептов."""
 
+    cache_namespaces = ('recipes', 'tags', 'ingredients', 'users')
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly, )
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [
+        DjangoFilterBackend, NameSearchFilter, RecipeOrderingFilter,
+    ]
     filterset_class = RecipeFilter
-    pagination_class = LimitPagination
+    pagination_class = RecipePagination
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = Recipe.objects.all()
+        return Recipe.objects.for_feed(self.request.user)
 
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(Favorite.objects.filter(
-                    user=user, recipe__pk=OuterRef('pk'))
-                ),
-                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
-                    user=user, recipe__pk=OuterRef('pk'))
-                )
-            )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
-            )
-        return queryset
+    def get_validators(self, request, *args, **kwargs):
+        if self.action != 'retrieve':
+            return None, None
+        recipe = Recipe.objects.for_feed(request.user).filter(
+            pk=kwargs['pk']
+        ).values(
+            'updated_at', 'is_favorited', 'is_in_shopping_cart',
+            'author_is_subscribed',
+        ).first()
+        if recipe is None:
+            return None, None
+        stamps = get_fragment_stamps({'request': request})
+        etag = make_etag(*recipe.values(), *stamps)
+        if request.user.is_authenticated:
+            # Избранное и корзина не меняют штампы, только ETag.
+            return etag, None
+        return etag, max(recipe['updated_at'], *stamps)
 
     def get_serializer_class(self):
         if self.action in ('favorite', 'shopping_cart'):
             return RecipeShortSerializer
-        elif self.action in ('create', 'partial_update'):
+        elif self.action in ('create', 'update', 'partial_update'):
             return RecipeWriteSerializer
         elif self.action == 'retrieve':
             return RecipeFullSerializer
@@ -153,7 +260,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }
         serializer = serializer_class(data=data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        # post_save вызывается вне транзакции save(): счётчик рецепта
+        # (recipes.signals) должен измениться вместе со связью.
+        with transaction.atomic():
+            serializer.save()
         serializer = self.get_serializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -199,33 +309,106 @@ class RecipeViewSet(viewsets.ModelViewSet):
         message = 'Рецепт успешно удален из корзины'
         return self.remove_from_list(request, pk, ShoppingCart, message)
 
-    def list_shopping_cart(self, ingredients):
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'{name} - {amount}, {unit}')
-
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response[
-            'Content-Disposition'
-        ] = 'attachment; filename="shopping_cart.txt"'
-        return response
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок с курсорной пагинацией."""
+        queryset = self.filter_queryset(
+            self.get_queryset().subscriptions_feed(request.user)
+        )
+        paginator = RecipeCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET', 'POST'],
+        permission_classes=[permissions.IsAdminUser],
+    )
+    def bulk(self, request):
+        """Пакетная выгрузка и загрузка рецептов в формате NDJSON.
+
+        Тело POST читается построчно без разбора парсерами DRF; строки
+        без автора получают автором текущего пользователя.
+        """
+        if request.method == 'GET':
+            return StreamingHttpResponse(
+                export_recipes(
+                    Recipe.objects.all(),
+                    chunk_size=settings.RECIPE_EXPORT_CHUNK_SIZE,
+                ),
+                content_type='application/x-ndjson; charset=utf-8',
+            )
+        importer = RecipeImporter(
+            request.user, settings.RECIPE_IMPORT_BATCH_SIZE
+        ).run(request.stream or ())
+        return Response(
+            {'created': importer.created, 'errors': importer.errors},
+            status=(
+                status.HTTP_201_CREATED if importer.created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+    @staticmethod
+    def get_shopping_list(user):
+        return ShoppingListItem.objects.filter(user=user).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            ingredient_amount=F('amount'),
+        ).order_by('ingredient__name')
 
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=[IsAuthenticatedOrReadOnly]
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ],
+        content_negotiation_class=ShoppingListNegotiation,
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientAmount.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount')).order_by(
-            'ingredient__name'
+        ingredients = self.get_shopping_list(request.user).iterator(
+            chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
         )
 
-        response = self.list_shopping_cart(ingredients)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
+        )
         return response
+
+
+class ResponseCacheStatsView(APIView):
+    """Счётчики попаданий в кеш ответов для анонимных пользователей.
+
+    Без общего бэкенда кеша счётчики свои у каждого воркера (см. CACHES).
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_stats())
+
+
+class MetricsView(View):
+    """Метрики ProfilingMiddleware в текстовом формате Prometheus.
+
+    Значения накапливаются в памяти процесса, поэтому каждый воркер
+    gunicorn отдаёт свои.
+    """
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render(), content_type='text/plain; version=0.0.4'
+        )
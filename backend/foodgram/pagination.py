@@ -0,0 +1,74 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CountStrategyPaginator(Paginator):
+    """Paginator с оценочным и кешируемым подсчётом строк.
+
+    Если планировщик оценивает выборку не меньше чем в
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD строк, вместо COUNT(*)
+    используется оценка. Большие значения кешируются по тексту
+    запроса на PAGINATION_COUNT_CACHE_TIMEOUT секунд; оценка меньше
+    порога тоже кешируется, чтобы не повторять EXPLAIN перед каждым
+    точным COUNT(*).
+    """
+
+    estimate_threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+    cache_timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+    is_count_approximate = False
+
+    def get_cache_key(self, prefix='pagination-count'):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(
+            f'{self.object_list.db}:{sql}:{params!r}'.encode()
+        ).hexdigest()
+        return f'{prefix}:{digest}'
+
+    def get_estimate(self):
+        key = self.get_cache_key('pagination-estimate')
+        estimate = cache.get(key)
+        if estimate is None:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None:
+                cache.set(key, estimate, self.cache_timeout)
+        return estimate
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            count, self.is_count_approximate = cached
+            return count
+        estimate = self.get_estimate()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            count, self.is_count_approximate = estimate, True
+        else:
+            count = self.object_list.count()
+        if count >= self.estimate_threshold:
+            cache.set(
+                key, (count, self.is_count_approximate), self.cache_timeout
+            )
+        return count
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +60,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# wsgi - gunicorn с потоками, asgi - воркеры uvicorn и асинхронные
+# представления api.async_views.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
 
 DATABASES = {
     'default': {
@@ -68,9 +75,38 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Постоянные соединения: не больше одного на поток воркера.
+        # В ASGI каждый запрос выполняет ORM в своём потоке, поэтому
+        # по умолчанию соединения не сохраняются.
+        'CONN_MAX_AGE': int(
+            os.getenv('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True')
+        == 'True',
+    }
+}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # lookup trigram_similar для api.filters.NameSearchFilter
+    INSTALLED_APPS.append('django.contrib.postgres')
+
+# LocMemCache живёт в памяти процесса: кеш ответов анонимам, версии
+# его пространств имён и счётчики /api/cache/stats/ у каждого воркера
+# свои. При нескольких воркерах нужен общий бэкенд, например
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# и CACHE_LOCATION=redis://redis:6379.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,6 +138,12 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Миниатюры рецептов создаются в фоновом пуле потоков recipes.images.
+RECIPE_THUMB_SIZE = (480, 480)
+RECIPE_THUMB_FORMAT = os.getenv('RECIPE_THUMB_FORMAT', 'WEBP')
+RECIPE_THUMB_QUALITY = 80
+RECIPE_THUMB_WORKERS = int(os.getenv('RECIPE_THUMB_WORKERS', 2))
+
 AUTH_USER_MODEL = 'users.User'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -111,10 +153,18 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Кеш токенов api.authentication: общий кеш (алиас из CACHES), а без
+# него LRU процесса. Время жизни LRU ограничивает задержку инвалидации
+# в других процессах, поэтому при нескольких воркерах задайте общий кеш.
+AUTH_TOKEN_CACHE_SIZE = 1024
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+AUTH_TOKEN_SHARED_CACHE = os.getenv('AUTH_TOKEN_SHARED_CACHE', '')
+AUTH_TOKEN_SHARED_CACHE_TTL = 300
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -155,5 +205,41 @@ COOKING_TIME_MIN_ERROR = (
 INGREDIENT_MIN_AMOUNT = 1
 
 PAGINATION_PAGE_SIZE = 6
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 100000
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+RECIPE_IMPORT_BATCH_SIZE = 500
+RECIPE_EXPORT_CHUNK_SIZE = 500
+
+# Рецепты авторов, у которых подписчиков больше порога, не копируются
+# в ленты (TimelineEntry), а читаются при запросе ленты.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 1000))
+# Сколько последних рецептов автора добавить в ленту при подписке.
+FEED_BACKFILL_LIMIT = 50
+FEED_BATCH_SIZE = 1000
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_TTL = 300
 
 CSRF_TRUSTED_ORIGINS = ['https://foodgrambykhit.sytes.net', 'https://84.201.179.250']
+
+# api.middleware.ProfilingMiddleware: Server-Timing, метрики /api/metrics/
+# и бюджеты SQL-запросов. Ключ бюджета - имя представления, можно
+# с методом ('GET recipes-list'); превышение пишется в лог или, при
+# QUERY_BUDGET_ACTION=raise, вызывает исключение.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', str(DEBUG)) == 'True'
+PROFILING_METRICS = os.getenv('PROFILING_METRICS') == 'True'
+QUERY_BUDGET_ACTION = os.getenv('QUERY_BUDGET_ACTION', 'log')
+QUERY_BUDGETS = {
+    'GET recipes-list': 6,
+    'GET recipes-detail': 8,
+    'POST recipes-list': 20,
+    'GET users-list': 4,
+    'GET users-me': 2,
+    'GET users-subscriptions': 4,
+    'GET tags-list': 3,
+    'GET ingredients-list': 3,
+    'GET recipes-download-shopping-cart': 2,
+}
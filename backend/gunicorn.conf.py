@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+
+# Число процессов и потоков берётся из окружения или от числа ядер.
+# Каждый поток держит своё соединение с БД (CONN_MAX_AGE), поэтому
+# workers * threads * число контейнеров должно помещаться
+# в max_connections PostgreSQL.
+cores = multiprocessing.cpu_count()
+
+# SERVER_MODE=asgi запускает foodgram.asgi в воркерах uvicorn.
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    default_worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    default_worker_class = 'gthread'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default_worker_class)
+workers = int(os.getenv('GUNICORN_WORKERS', cores + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером при preload, не делятся с воркерами.
+    from django.db import connections
+    connections.close_all()
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from foodgram.pagination import CountStrategyPaginator
+
 from .models import (
     Favorite,
     Ingredient,
@@ -12,14 +14,22 @@ from .models import (
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    """Модель ингредиента в админке."""
+    """Модель ингредиента в админке.
+
+    Поиск по name использует индексы pg_trgm из миграции
+    recipes.0007_name_search_indexes.
+    """
 
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('name',)
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
 
 
 class IngredientsInline(admin.TabularInline):
     model = IngredientAmount
+    autocomplete_fields = ('ingredient',)
     extra = 1
 
 
@@ -28,28 +38,42 @@ class TagAdmin(admin.ModelAdmin):
     """Модель тега в админке."""
 
     list_display = ('id', 'name', 'color', 'slug')
+    search_fields = ('name', 'slug')
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Модель рецепта в админке."""
 
-    list_display = ('name', 'author', 'text', 'added_to_favorite')
-    list_filter = ('author', 'name', 'tags')
+    list_display = (
+        'name', 'author', 'text', 'added_to_favorite', 'in_carts_count',
+    )
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', 'tags')
     inlines = (IngredientsInline,)
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
 
     @staticmethod
+    @admin.display(description='В избранном', ordering='favorites_count')
     def added_to_favorite(obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
-class GenreAdmin(admin.ModelAdmin):
+class FavoriteAdmin(admin.ModelAdmin):
     list_display = (
         'id',
         'recipe',
         'user'
     )
+    list_select_related = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username')
+    autocomplete_fields = ('recipe', 'user')
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
@@ -59,6 +83,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         'recipe',
         'user'
     )
+    list_select_related = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username')
+    autocomplete_fields = ('recipe', 'user')
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
 
 
 @admin.register(IngredientAmount)
@@ -69,3 +98,8 @@ class IngredientAmountAdmin(admin.ModelAdmin):
         'recipe',
         'amount'
     )
+    list_select_related = ('ingredient', 'recipe')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('ingredient', 'recipe')
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
@@ -0,0 +1,260 @@
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+
+from users.models import User
+
+from .images import schedule_thumbnails
+from .models import Ingredient, IngredientAmount, Recipe, Tag
+from .signals import bulk_changed
+
+INGREDIENT_MAX_AMOUNT = 32000
+
+
+def is_integer(value):
+    """Целое число JSON: bool - подкласс int, но true/false не числа."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class RecipeImporter:
+    """Пакетный импорт рецептов из строк NDJSON.
+
+    Формат строки совпадает с export_recipes: name, text, cooking_time,
+    tags (slug), ingredients (name, measurement_unit, amount), author
+    (email) и image - путь к уже загруженному в хранилище файлу.
+    Справочники тегов и ингредиентов загружаются один раз, строки
+    проверяются по отдельности, а корректные рецепты записываются
+    пачками через bulk_create. Если пачка нарушила ограничение базы,
+    её строки записываются по одной, каждая в своей точке сохранения.
+    Ошибки строк собираются в errors и не прерывают импорт.
+    """
+
+    def __init__(self, author=None, batch_size=500):
+        self.author = author
+        self.batch_size = batch_size
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.authors = {}
+        self.names = set()
+        self.created = 0
+        self.errors = []
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            try:
+                batch.append((number, json.loads(line)))
+            except ValueError as error:
+                self.add_error(number, f'Некорректный JSON: {error}')
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+                batch = []
+        if batch:
+            self.save_batch(batch)
+        return self
+
+    def add_error(self, number, errors):
+        self.errors.append({'line': number, 'errors': errors})
+
+    def load_authors(self, rows):
+        emails = {
+            row.get('author') for _, row in rows
+            if isinstance(row, dict) and isinstance(row.get('author'), str)
+        } - self.authors.keys()
+        if emails:
+            self.authors.update(
+                User.objects.filter(email__in=emails).values_list(
+                    'email', 'id'
+                )
+            )
+
+    def build(self, row):
+        """Рецепт со списками тегов и ингредиентов или словарь ошибок."""
+        if not isinstance(row, dict):
+            return None, {'row': 'Ожидается JSON-объект.'}
+        errors = {}
+        name = row.get('name')
+        if not isinstance(name, str) or not name.strip():
+            errors['name'] = 'Обязательное поле.'
+        elif len(name) > Recipe._meta.get_field('name').max_length:
+            errors['name'] = 'Слишком длинное название.'
+        elif name in self.names:
+            errors['name'] = 'Рецепт с таким названием уже существует.'
+        if not isinstance(row.get('text'), str) or not row['text'].strip():
+            errors['text'] = 'Обязательное поле.'
+        cooking_time = row.get('cooking_time')
+        if (
+            not is_integer(cooking_time)
+            or cooking_time < settings.COOKING_TIME_MIN_VALUE
+        ):
+            errors['cooking_time'] = settings.COOKING_TIME_MIN_ERROR
+
+        if self.author is not None and 'author' not in row:
+            author_id = self.author.id
+        else:
+            author_id = self.authors.get(row.get('author'))
+            if author_id is None:
+                errors['author'] = 'Пользователь не найден.'
+
+        slugs = row.get('tags')
+        if not isinstance(slugs, list) or not slugs:
+            errors['tags'] = 'Нужно указать хотя бы 1 тег.'
+        elif len(set(map(str, slugs))) != len(slugs):
+            errors['tags'] = 'Теги не должны повторяться.'
+        elif any(slug not in self.tags for slug in slugs):
+            errors['tags'] = 'Неизвестный тег.'
+
+        amounts = {}
+        ingredients = row.get('ingredients')
+        if not isinstance(ingredients, list) or not ingredients:
+            errors['ingredients'] = 'Список ингредиентов не должен быть пустым'
+        else:
+            for ingredient in ingredients:
+                if not isinstance(ingredient, dict):
+                    errors['ingredients'] = 'Ожидается JSON-объект.'
+                    break
+                ingredient_id = self.ingredients.get((
+                    ingredient.get('name'),
+                    ingredient.get('measurement_unit'),
+                ))
+                amount = ingredient.get('amount')
+                if ingredient_id is None:
+                    errors['ingredients'] = (
+                        f'Неизвестный ингредиент: {ingredient.get("name")}'
+                    )
+                elif ingredient_id in amounts:
+                    errors['ingredients'] = 'Ингредиенты не должны повторяться'
+                elif (
+                    not is_integer(amount)
+                    or not 1 <= amount <= INGREDIENT_MAX_AMOUNT
+                ):
+                    errors['ingredients'] = 'Некорректное количество.'
+                else:
+                    amounts[ingredient_id] = amount
+                    continue
+                break
+
+        image = row.get('image', '')
+        if not isinstance(image, str):
+            errors['image'] = 'Ожидается путь к файлу в хранилище.'
+        if errors:
+            return None, errors
+        recipe = Recipe(
+            name=name,
+            text=row['text'],
+            cooking_time=cooking_time,
+            author_id=author_id,
+            image=image,
+        )
+        return (recipe, [self.tags[slug] for slug in slugs], amounts), None
+
+    def save_batch(self, rows):
+        self.load_authors(rows)
+        names = [
+            row['name'] for _, row in rows
+            if isinstance(row, dict) and isinstance(row.get('name'), str)
+        ]
+        self.names.update(
+            Recipe.objects.filter(name__in=names).values_list(
+                'name', flat=True
+            )
+        )
+        built = []
+        for number, row in rows:
+            result, errors = self.build(row)
+            if errors:
+                self.add_error(number, errors)
+                continue
+            self.names.add(result[0].name)
+            built.append((number, *result))
+        if not built:
+            return
+        try:
+            with transaction.atomic():
+                recipes = self.write(built)
+        except IntegrityError:
+            recipes = self.write_rows(built)
+        if not recipes:
+            return
+        self.created += len(recipes)
+        schedule_thumbnails(recipe.pk for recipe in recipes if recipe.image)
+        bulk_changed.send(sender=Recipe, instances=recipes, created=True)
+
+    def write_rows(self, built):
+        """Запись строк откатившейся пачки по одной."""
+        recipes = []
+        for item in built:
+            number, recipe, *_ = item
+            # bulk_create успел назначить pk, откат его не сбросил.
+            recipe.pk = None
+            recipe._state.adding = True
+            try:
+                with transaction.atomic():
+                    recipes.extend(self.write([item]))
+            except IntegrityError as error:
+                self.add_error(number, f'Ошибка записи: {error}')
+        return recipes
+
+    @staticmethod
+    def write(built):
+        recipes = Recipe.objects.bulk_create(
+            recipe for _, recipe, _, _ in built
+        )
+        if any(recipe.pk is None for recipe in recipes):
+            ids = dict(
+                Recipe.objects.filter(
+                    name__in=[recipe.name for recipe in recipes]
+                ).values_list('name', 'id')
+            )
+            for recipe in recipes:
+                recipe.pk = ids[recipe.name]
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for _, recipe, _, amounts in built
+            for ingredient_id, amount in amounts.items()
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for _, recipe, tag_ids, _ in built
+            for tag_id in tag_ids
+        )
+        return recipes
+
+
+def export_recipes(queryset, chunk_size=500):
+    """Рецепты построчно в формате NDJSON для RecipeImporter."""
+    recipes = queryset.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredients_amount',
+            queryset=IngredientAmount.objects.select_related('ingredient'),
+        ),
+    ).order_by('pk')
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        yield json.dumps({
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': recipe.author.email,
+            'image': recipe.image.name,
+            'tags': [tag.slug for tag in recipe.tags.all()],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients_amount.all()
+            ],
+        }, ensure_ascii=False) + '\n'
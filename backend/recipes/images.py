@@ -0,0 +1,103 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .signals import bulk_changed
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_THUMB_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def render_thumbnail(file):
+    """Уменьшенная и пережатая копия изображения в байтах."""
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.RECIPE_THUMB_SIZE)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        if settings.RECIPE_THUMB_FORMAT == 'JPEG':
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(
+            buffer,
+            settings.RECIPE_THUMB_FORMAT,
+            quality=settings.RECIPE_THUMB_QUALITY,
+            optimize=True,
+        )
+    return buffer.getvalue()
+
+
+def make_thumbnail(recipe_id):
+    """Создаёт миниатюру рецепта и записывает её одним UPDATE.
+
+    Миниатюра сохраняется, только если за время обработки изображение
+    рецепта не заменили. updated_at меняется вместе с ней, чтобы
+    обновились кеш фрагментов и ETag.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_thumb'
+    ).first()
+    if recipe is None or not recipe.image:
+        return False
+    with recipe.image.open('rb') as file:
+        content = render_thumbnail(file)
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(recipe.image.name))[0],
+        FORMAT_EXTENSIONS[settings.RECIPE_THUMB_FORMAT],
+    )
+    old_thumb = recipe.image_thumb.name
+    recipe.image_thumb.save(name, ContentFile(content), save=False)
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_thumb=recipe.image_thumb.name, updated_at=timezone.now())
+    if not updated:
+        recipe.image_thumb.delete(save=False)
+        return False
+    if old_thumb and old_thumb != recipe.image_thumb.name:
+        recipe.image_thumb.storage.delete(old_thumb)
+    bulk_changed.send(sender=Recipe, instances=[recipe])
+    return True
+
+
+def run_in_background(recipe_id):
+    try:
+        make_thumbnail(recipe_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру рецепта %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnails(recipe_ids):
+    """Ставит создание миниатюр в фоновый пул после коммита транзакции."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    def submit():
+        executor = get_executor()
+        for recipe_id in recipe_ids:
+            executor.submit(run_in_background, recipe_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,71 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия приводятся к casefold и хранятся в отсортированном списке:
+    префиксный диапазон находится бинарным поиском, подстрока ищется
+    линейным проходом только если префиксных совпадений не хватило.
+    Индекс строится при первом обращении и сбрасывается сигналами
+    при изменении ингредиентов, а в остальных процессах - по истечении ttl.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._built_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = self._rows = None
+
+    def _is_stale(self):
+        return self._keys is None or (
+            self.ttl is not None
+            and time.monotonic() - self._built_at > self.ttl
+        )
+
+    def _load(self):
+        with self._lock:
+            if self._is_stale():
+                rows = sorted(
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator(),
+                    key=lambda row: (
+                        row['name'].casefold(),
+                        row['measurement_unit'],
+                        row['id'],
+                    ),
+                )
+                self._keys = [row['name'].casefold() for row in rows]
+                self._rows = rows
+                self._built_at = time.monotonic()
+            return self._keys, self._rows
+
+    def search(self, query, limit=None):
+        """Ингредиенты по названию: точные совпадения, префикс, подстрока."""
+        query = query.strip().casefold()
+        keys, rows = self._load()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_right(keys, query + chr(0x10FFFF), lo=start)
+        exact_end = bisect.bisect_right(keys, query, lo=start, hi=end)
+        result = rows[start:exact_end] + rows[exact_end:end]
+        if limit is None or len(result) < limit:
+            result.extend(
+                row for key, row in zip(keys, rows)
+                if query in key and not key.startswith(query)
+            )
+        return result[:limit]
+
+
+ingredient_index = IngredientIndex(ttl=settings.INGREDIENT_INDEX_TTL)
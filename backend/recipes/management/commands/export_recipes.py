@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.bulk import export_recipes
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout'
+        )
+
+    def handle(self, **options):
+        lines = export_recipes(Recipe.objects.all())
+        if not options['output']:
+            sys.stdout.writelines(lines)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+        self.stdout.write(self.style.SUCCESS('Рецепты выгружены'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_thumbnail
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание миниатюр изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры, в том числе существующие',
+        )
+
+    def handle(self, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_thumb='')
+        created = failed = 0
+        for recipe_id in recipes.values_list('pk', flat=True).iterator():
+            try:
+                created += make_thumbnail(recipe_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created}, ошибок: {failed}'
+        ))
@@ -1,23 +1,143 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from recipes.models import Ingredient
+from recipes.signals import bulk_changed
+
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_csv(file):
+    for row in csv.DictReader(file, delimiter=','):
+        yield row
+
+
+def iter_json(file, chunk_size=65536):
+    """Объекты JSON-массива по одному без загрузки всего файла."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Файл JSON обрезан или повреждён')
+            buffer += chunk
+            continue
+        yield row
+        buffer = buffer[end:]
+
+
+def detect_format(path, file):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.csv', '.json'):
+        return extension[1:]
+    first = file.read(1)
+    while first.isspace():
+        first = file.read(1)
+    file.seek(0)
+    return 'json' if first == '[' else 'csv'
 
 
 class Command(BaseCommand):
     help = 'Импорт ингредиентов в БД'
 
-    def handle(self, **kwargs):
-        with open(
-            os.path.join(settings.BASE_DIR, 'data/ingredients.csv'), 'r',
-            encoding='UTF-8',
-        ) as file:
-            reader = csv.DictReader(file, delimiter=',')
-            ingredients = [Ingredient(**data) for data in reader]
-            Ingredient.objects.bulk_create(ingredients)
-        self.stdout.write(
-            self.style.SUCCESS('Ингредиенты загружены в БД')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
+            help='Файл CSV или JSON, формат определяется автоматически',
         )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Число строк в одной пачке',
+        )
+
+    def handle(self, **options):
+        if options['batch_size'] < 1:
+            # islice(rows, 0) сразу вернул бы пустую пачку.
+            raise CommandError('--batch-size должен быть не меньше 1')
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        with open(options['path'], 'r', encoding='UTF-8') as file:
+            reader = {'csv': iter_csv, 'json': iter_json}[
+                detect_format(options['path'], file)
+            ]
+            rows = self.clean(reader(file))
+            batches = self.batches(rows, options['batch_size'])
+            if connection.vendor == 'postgresql':
+                self.copy(batches)
+            else:
+                self.insert(batches)
+        created = Ingredient.objects.count() - before
+        if created:
+            bulk_changed.send(sender=Ingredient, instances=None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены в БД: строк {self.total}, '
+            f'новых {created}, {time.perf_counter() - started:.2f} с'
+        ))
+
+    def clean(self, rows):
+        max_length = settings.LENGTH_MAX
+        for number, row in enumerate(rows, 1):
+            values = tuple(
+                str(row.get(field) or '').strip() for field in FIELDS
+            )
+            if not all(values) or max(map(len, values)) > max_length:
+                self.stderr.write(f'Пропущена запись {number}: {row}')
+                continue
+            yield values
+
+    def batches(self, rows, batch_size):
+        self.total = 0
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+            self.total += len(batch)
+            self.stdout.write(f'Обработано строк: {self.total}')
+
+    def insert(self, batches):
+        for batch in batches:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True,
+            )
+
+    def copy(self, batches):
+        """Загрузка через COPY во временную таблицу и INSERT ON CONFLICT."""
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in batches:
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator='\n').writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
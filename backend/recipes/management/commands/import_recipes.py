@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.bulk import RecipeImporter
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт рецептов из NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл NDJSON или "-" для стандартного ввода'
+        )
+        parser.add_argument(
+            '--author',
+            help='Email автора для строк без поля author',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Число рецептов в одной пачке bulk_create',
+        )
+
+    def handle(self, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError('Автор не найден')
+        importer = RecipeImporter(author, options['batch_size'])
+        started = time.perf_counter()
+        if options['path'] == '-':
+            importer.run(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                importer.run(file)
+        elapsed = time.perf_counter() - started
+        for error in importer.errors:
+            self.stderr.write(f'Строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {importer.created}, '
+            f'ошибок: {len(importer.errors)}, '
+            f'{importer.created / elapsed:.0f} рецептов/с'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт или проверка счётчиков избранного и корзин рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить счётчики с таблицами избранного и корзин',
+        )
+
+    def handle(self, **options):
+        if not options['check']:
+            updated = Recipe.objects.recount()
+            self.stdout.write(
+                self.style.SUCCESS(f'Счётчики пересчитаны: {updated}')
+            )
+            return
+        fields = ('favorites_count', 'in_carts_count')
+        mismatches = Recipe.objects.annotate(**{
+            f'live_{field}': subquery
+            for field, subquery in Recipe.objects.counter_subqueries().items()
+        }).values_list('pk', *fields, *(f'live_{field}' for field in fields))
+        total = 0
+        for pk, *values in mismatches.iterator():
+            stored, live = values[:2], [value or 0 for value in values[2:]]
+            if stored != live:
+                total += 1
+                self.stdout.write(f'recipe={pk}: {stored} != {live}')
+        if total:
+            raise CommandError(f'Расхождений: {total}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
@@ -0,0 +1,234 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+    TimelineEntry,
+)
+from recipes.signals import bulk_changed
+from users.models import Subscription, User
+
+EMAIL_DOMAIN = 'benchmark.test'
+PASSWORD = 'benchmark-password'
+# Пользователи cart<N>@EMAIL_DOMAIN с N рецептами в корзине для
+# замеров выгрузки списка покупок в benchmark_api.
+CART_SIZES = (10, 100, 1000)
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def zipf_weights(size, exponent):
+    """Веса популярности авторов: k-й по популярности ~ 1 / k^s."""
+    return [1 / rank ** exponent for rank in range(1, size + 1)]
+
+
+def sample_unique(rng, population, weights, count):
+    """До count различных элементов с учётом весов."""
+    count = min(count, len(population))
+    chosen = set()
+    for _ in range(count * 10):
+        if len(chosen) >= count:
+            break
+        chosen.update(rng.choices(population, weights, k=count - len(chosen)))
+    return chosen
+
+
+class Command(BaseCommand):
+    help = 'Синтетические данные для бенчмарков API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=15,
+            help='Среднее число избранных рецептов пользователя',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее число рецептов в корзине пользователя',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности авторов',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее созданные данные бенчмарка',
+        )
+
+    def handle(self, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                email__endswith=f'@{EMAIL_DOMAIN}'
+            ).delete()
+            self.stdout.write(f'Удалено объектов: {deleted}')
+        if not Ingredient.objects.exists():
+            call_command('import_ingredients', stdout=self.stdout)
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            tags = self.get_tags()
+            recipes = self.create_recipes(
+                rng, users, tags, options['recipes'], options['zipf']
+            )
+            self.create_relations(rng, users, recipes, options)
+            self.create_cart_users(recipes)
+            ShoppingListItem.objects.rebuild()
+            Recipe.objects.recount()
+            TimelineEntry.objects.rebuild()
+        bulk_changed.send(sender=Recipe, instances=recipes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)}, '
+            f'{time.perf_counter() - started:.1f} с. '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
+
+    def create_users(self, count):
+        start = User.objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).count()
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(
+                email=f'user{number}@{EMAIL_DOMAIN}',
+                username=f'benchmark{number}',
+                first_name='Имя',
+                last_name=f'Фамилия {number}',
+                password=password,
+            )
+            for number in range(start, start + count)
+        )
+        # Первые пользователи - самые популярные авторы.
+        return list(
+            User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+            .order_by('id')
+        )
+
+    @staticmethod
+    def get_tags():
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_recipes(self, rng, users, tags, count, exponent):
+        start = Recipe.objects.filter(name__startswith='Бенчмарк ').count()
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        authors = rng.choices(
+            users, zipf_weights(len(users), exponent), k=count
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Бенчмарк {start + number}',
+                text='Синтетический рецепт для бенчмарков. ' * 5,
+                cooking_time=rng.randint(5, 180),
+            )
+            for number, author in enumerate(authors)
+        )
+        if any(recipe.pk is None for recipe in recipes):
+            recipes = list(
+                Recipe.objects.filter(name__startswith='Бенчмарк ')
+                .order_by('-id')[:count]
+            )
+        IngredientAmount.objects.bulk_create(
+            (
+                IngredientAmount(
+                    recipe=recipe, ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in rng.sample(
+                    ingredient_ids, rng.randint(5, 20)
+                )
+            ),
+            batch_size=5000,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in rng.sample(tags, rng.randint(1, len(tags)))
+            ),
+            batch_size=5000,
+        )
+        return recipes
+
+    @staticmethod
+    def create_cart_users(recipes):
+        password = make_password(PASSWORD)
+        carts = []
+        for size in CART_SIZES:
+            user, _ = User.objects.get_or_create(
+                email=f'cart{size}@{EMAIL_DOMAIN}',
+                defaults={
+                    'username': f'benchmark-cart{size}',
+                    'first_name': 'Корзина',
+                    'last_name': str(size),
+                    'password': password,
+                },
+            )
+            carts.extend(
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in recipes[:size]
+            )
+        ShoppingCart.objects.bulk_create(
+            carts, batch_size=5000, ignore_conflicts=True
+        )
+
+    @staticmethod
+    def create_relations(rng, users, recipes, options):
+        weights = zipf_weights(len(users), options['zipf'])
+        subscriptions, favorites, carts = [], [], []
+        for user in users:
+            authors = sample_unique(
+                rng, users, weights,
+                rng.randint(0, 2 * options['subscriptions']),
+            )
+            subscriptions.extend(
+                Subscription(user=user, author=author)
+                for author in authors if author != user
+            )
+            favorites.extend(
+                Favorite(user=user, recipe=recipe)
+                for recipe in rng.sample(
+                    recipes, min(len(recipes),
+                                 rng.randint(0, 2 * options['favorites']))
+                )
+            )
+            carts.extend(
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in rng.sample(
+                    recipes, min(len(recipes),
+                                 rng.randint(0, 2 * options['carts']))
+                )
+            )
+        for model, objects in (
+            (Subscription, subscriptions),
+            (Favorite, favorites),
+            (ShoppingCart, carts),
+        ):
+            model.objects.bulk_create(
+                objects, batch_size=5000, ignore_conflicts=True
+            )
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+SEARCH_TABLES = ('recipes_ingredient', 'recipes_recipe')
+
+POSTGRESQL_INDEXES = (
+    # istartswith: UPPER(name::text) LIKE 'X%'
+    'CREATE INDEX IF NOT EXISTS {table}_name_upper_idx '
+    'ON {table} (UPPER(name::text) text_pattern_ops)',
+    # icontains: UPPER(name::text) LIKE '%X%'
+    'CREATE INDEX IF NOT EXISTS {table}_name_upper_trgm_idx '
+    'ON {table} USING gin (UPPER(name::text) gin_trgm_ops)',
+    # trigram_similar: name % 'x'
+    'CREATE INDEX IF NOT EXISTS {table}_name_trgm_idx '
+    'ON {table} USING gin (name gin_trgm_ops)',
+)
+
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5("
+    "name, content='{table}', content_rowid='id', tokenize='trigram')",
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+    'CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END',
+    'CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    'CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    'INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END',
+)
+
+
+def execute(schema_editor, statements):
+    for table in SEARCH_TABLES:
+        for statement in statements:
+            schema_editor.execute(statement.format(table=table))
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        execute(schema_editor, POSTGRESQL_INDEXES)
+    elif vendor == 'sqlite':
+        execute(schema_editor, SQLITE_FTS)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        execute(schema_editor, (
+            'DROP INDEX IF EXISTS {table}_name_upper_idx',
+            'DROP INDEX IF EXISTS {table}_name_upper_trgm_idx',
+            'DROP INDEX IF EXISTS {table}_name_trgm_idx',
+        ))
+    elif vendor == 'sqlite':
+        execute(schema_editor, (
+            'DROP TRIGGER IF EXISTS {table}_fts_ai',
+            'DROP TRIGGER IF EXISTS {table}_fts_ad',
+            'DROP TRIGGER IF EXISTS {table}_fts_au',
+            'DROP TABLE IF EXISTS {table}_fts',
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:41
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Переносит ссылки на дубликаты в ингредиент с наименьшим id."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        keep_id = group['keep_id']
+        drop_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        for model_name, owner in (
+            ('IngredientAmount', 'recipe_id'),
+            ('ShoppingListItem', 'user_id'),
+        ):
+            model = apps.get_model('recipes', model_name)
+            kept = {
+                getattr(item, owner): item
+                for item in model.objects.filter(ingredient_id=keep_id)
+            }
+            for item in model.objects.filter(ingredient_id__in=drop_ids):
+                target = kept.get(getattr(item, owner))
+                if target is None:
+                    item.ingredient_id = keep_id
+                    item.save(update_fields=['ingredient'])
+                    kept[getattr(item, owner)] = item
+                    continue
+                # Уникальность (владелец, ингредиент): складываем количества.
+                target.amount += item.amount
+                target.save(update_fields=['amount'])
+                item.delete()
+        Ingredient.objects.filter(id__in=drop_ids).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # Удаления оставляют отложенные проверки внешних ключей
+        # (DEFERRABLE INITIALLY DEFERRED), и AddConstraint в той же
+        # транзакции падает с "pending trigger events". SET CONSTRAINTS
+        # ALL IMMEDIATE выполняет их сразу.
+        schema_editor.connection.check_constraints()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_name_measurement_unit'),
+        ),
+    ]
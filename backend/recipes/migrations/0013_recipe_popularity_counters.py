@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:57
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = {}
+    for field, model_name in (
+        ('favorites_count', 'Favorite'),
+        ('in_carts_count', 'ShoppingCart'),
+    ):
+        model = apps.get_model('recipes', model_name)
+        counters[field] = Coalesce(models.Subquery(
+            model.objects.filter(recipe_id=models.OuterRef('pk')).order_by()
+            .values('recipe_id').annotate(total=models.Count('pk'))
+            .values('total'),
+            output_field=models.PositiveIntegerField(),
+        ), 0)
+    Recipe.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_image_thumb'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_id_idx'),
+        ),
+    ]
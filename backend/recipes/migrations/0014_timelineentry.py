@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """Ленты из существующих подписок, кроме авторов-знаменитостей."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    followers = {}
+    for user_id, author_id in Subscription.objects.order_by().values_list(
+        'user_id', 'author_id'
+    ):
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id, user_ids in followers.items():
+        if len(user_ids) > settings.FEED_FANOUT_MAX_FOLLOWERS:
+            continue
+        recipe_ids = list(Recipe.objects.filter(
+            author_id=author_id
+        ).values_list('pk', flat=True))
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipe_ids
+            ),
+            batch_size=settings.FEED_BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_popularity_counters'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_timeline_recipe'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_skipped_recipes(apps, schema_editor):
+    """Рецепты авторов, которых 0014_timelineentry не разослал."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    celebrity_ids = Subscription.objects.order_by().values(
+        'author_id'
+    ).annotate(
+        total=models.Count('pk')
+    ).filter(
+        total__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values('author_id')
+    Recipe.objects.filter(author_id__in=celebrity_ids).update(
+        fanned_out=False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_timelineentry'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Разослан в ленты подписчиков'),
+        ),
+        migrations.RunPython(mark_skipped_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-pub_date'], name='recipe_not_fanned_out_idx'),
+        ),
+    ]
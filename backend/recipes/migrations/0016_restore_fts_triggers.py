@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SEARCH_TABLES = ('recipes_ingredient', 'recipes_recipe')
+
+# Пересоздание таблицы в миграциях SQLite (AlterField, AddField
+# с ограничениями, AddConstraint) удаляет триггеры 0007, и FTS-индекс
+# перестаёт видеть новые строки.
+SQLITE_TRIGGERS = (
+    'DROP TRIGGER IF EXISTS {table}_fts_ai',
+    'DROP TRIGGER IF EXISTS {table}_fts_ad',
+    'DROP TRIGGER IF EXISTS {table}_fts_au',
+    'CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END',
+    'CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    'CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    'INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END',
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+)
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_TABLES:
+        for statement in SQLITE_TRIGGERS:
+            schema_editor.execute(statement.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_fanned_out'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
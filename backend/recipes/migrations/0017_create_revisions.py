@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Разделы, штампы которых читают ETag и ключи фрагментов рецептов.
+NAMES = ('tags', 'ingredients', 'users')
+
+
+def create_revisions(apps, schema_editor):
+    Revision = apps.get_model('recipes', 'Revision')
+    now = timezone.now()
+    for name in NAMES:
+        Revision.objects.get_or_create(
+            name=name, defaults={'updated_at': now}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_restore_fts_triggers'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_revisions, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,25 @@
+from collections import defaultdict
+
 from colorfield.fields import ColorField
 from django.conf import settings
 from django.core import validators
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from users.models import User
+from users.models import Subscription, User
 
 
 class Ingredient(models.Model):
@@ -23,6 +38,12 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit',),
+                name='unique_name_measurement_unit',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -58,8 +79,13 @@ class Tag(models.Model):
 class RecipeQuerySet(models.QuerySet):
 
     def filter_tags(self, tags):
+        """Рецепты хотя бы с одним из тегов (объекты Tag или id)."""
         if tags:
-            return self.filter(tags__slug__in=tags).distinct()
+            return self.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef('pk'), tag__in=tags,
+                )
+            ))
         return self
 
     def add_user_annotations(self, user_id):
@@ -78,6 +104,92 @@ class RecipeQuerySet(models.QuerySet):
             ),
         )
 
+    @staticmethod
+    def feed_prefetch():
+        return (
+            'tags',
+            Prefetch(
+                'ingredients_amount',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def subscriptions_feed(self, user):
+        """Рецепты авторов, на которых подписан user.
+
+        Разосланные рецепты берутся из ленты TimelineEntry, рецепты
+        с fanned_out=False (автор был знаменитостью при публикации)
+        выбираются при чтении, даже если подписчиков стало меньше.
+        """
+        return self.filter(
+            Exists(
+                TimelineEntry.objects.filter(
+                    user_id=user.id, recipe_id=OuterRef('pk'),
+                )
+            )
+            | Q(
+                fanned_out=False,
+                author__in=Subscription.objects.filter(
+                    user_id=user.id
+                ).values('author_id'),
+            )
+        )
+
+    def for_feed(self, user):
+        """Рецепты с автором и персональными признаками пользователя.
+
+        Признаки избранного, корзины и подписки на автора вычисляются
+        в основном запросе. Теги и ингредиенты (feed_prefetch)
+        догружает RecipeFullSerializer только для рецептов,
+        которых нет в кеше фрагментов.
+        """
+        queryset = self.select_related('author')
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(
+                    False, output_field=BooleanField()
+                ),
+            )
+        return queryset.add_user_annotations(user.id).annotate(
+            author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    author_id=OuterRef('author_id'),
+                    user_id=user.id,
+                )
+            ),
+        )
+
+    @staticmethod
+    def counter_subqueries():
+        """Число избранных и корзин рецепта, посчитанное по таблицам."""
+        return {
+            field: Subquery(
+                model.objects.filter(recipe_id=OuterRef('pk')).order_by()
+                .values('recipe_id').annotate(total=Count('pk'))
+                .values('total'),
+                output_field=models.PositiveIntegerField(),
+            )
+            for field, model in (
+                ('favorites_count', Favorite),
+                ('in_carts_count', ShoppingCart),
+            )
+        }
+
+    def recount(self):
+        """Пересчитывает favorites_count и in_carts_count одним UPDATE."""
+        return self.update(**{
+            field: Coalesce(subquery, 0)
+            for field, subquery in self.counter_subqueries().items()
+        })
+
+    def change_counter(self, field, delta):
+        """Атомарно изменяет счётчик через F(), без чтения строки."""
+        return self.update(**{field: F(field) + delta})
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -96,6 +208,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение',
     )
+    image_thumb = models.ImageField(
+        blank=True,
+        editable=False,
+        upload_to='recipes/thumbs/',
+        verbose_name='Миниатюра',
+    )
     text = models.TextField(
         verbose_name='Текст',
     )
@@ -121,17 +239,51 @@ class Recipe(models.Model):
             ),
         ],
     )
+    fanned_out = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Разослан в ленты подписчиков',
+    )
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_id_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_not_fanned_out_idx',
+                condition=Q(fanned_out=False),
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -220,3 +372,293 @@ class ShoppingCart(models.Model):
                 name='unique_user_shopping',
             ),
         )
+
+
+class ShoppingListQuerySet(models.QuerySet):
+
+    def add_amounts(self, user_ids, amounts):
+        """Прибавляет количества {ingredient_id: amount} к спискам покупок.
+
+        Отрицательные значения уменьшают позиции, обнулившиеся позиции
+        удаляются.
+        """
+        user_ids = list(user_ids)
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not user_ids or not amounts:
+            return
+        try:
+            with transaction.atomic():
+                self._apply_amounts(user_ids, amounts)
+        except IntegrityError:
+            # select_for_update() не блокирует ещё не созданные строки:
+            # параллельный запрос успел добавить ту же позицию. Повтор
+            # увидит её и заблокирует.
+            with transaction.atomic():
+                self._apply_amounts(user_ids, amounts)
+
+    def _apply_amounts(self, user_ids, amounts):
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=amounts,
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        ))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ('amount',))
+        self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user_ids, recipe_id, sign=1):
+        amounts = IngredientAmount.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+        self.add_amounts(
+            user_ids,
+            {ingredient_id: sign * amount for ingredient_id, amount in amounts}
+        )
+
+    def remove_recipe(self, user_ids, recipe_id):
+        self.add_recipe(user_ids, recipe_id, sign=-1)
+
+    @staticmethod
+    def live_totals():
+        """Суммы ингредиентов, посчитанные по корзинам через GROUP BY."""
+        return IngredientAmount.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'ingredient_id', user_id=F('recipe__shopping_cart__user_id')
+        ).annotate(total=Sum('amount')).order_by()
+
+    def rebuild(self):
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self.model(
+                    user_id=row['user_id'],
+                    ingredient_id=row['ingredient_id'],
+                    amount=row['total'],
+                )
+                for row in self.live_totals()
+            )
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient',),
+                name='unique_user_ingredient',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
+
+
+class TimelineQuerySet(models.QuerySet):
+
+    @staticmethod
+    def celebrities():
+        """Авторы, у которых больше FEED_FANOUT_MAX_FOLLOWERS подписчиков.
+
+        Подписчики просматриваются только до порога (OFFSET в EXISTS),
+        поэтому проверка не зависит от их общего числа.
+        """
+        return User.objects.filter(Exists(
+            Subscription.objects.filter(
+                author_id=OuterRef('pk')
+            ).order_by()[settings.FEED_FANOUT_MAX_FOLLOWERS:]
+        ))
+
+    def fan_out(self, recipes):
+        """Добавляет рецепты в ленты подписчиков их авторов.
+
+        Рецепты знаменитостей не рассылаются и помечаются
+        fanned_out=False для RecipeQuerySet.subscriptions_feed.
+        """
+        recipes = [recipe for recipe in recipes if recipe.pk]
+        author_ids = {recipe.author_id for recipe in recipes}
+        celebrity_ids = set(
+            self.celebrities().filter(
+                pk__in=author_ids
+            ).values_list('pk', flat=True)
+        )
+        Recipe.objects.filter(
+            pk__in=[
+                recipe.pk for recipe in recipes
+                if recipe.author_id in celebrity_ids
+            ]
+        ).update(fanned_out=False)
+        author_ids -= celebrity_ids
+        followers = defaultdict(list)
+        for user_id, author_id in Subscription.objects.filter(
+            author_id__in=author_ids
+        ).order_by().values_list('user_id', 'author_id'):
+            followers[author_id].append(user_id)
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, recipe_id=recipe.pk)
+                for recipe in recipes
+                for user_id in followers[recipe.author_id]
+            ),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user_id, author_id):
+        """Последние FEED_BACKFILL_LIMIT рецептов автора в ленту.
+
+        Выполняется и для знаменитостей: их рецепты, разосланные до
+        превышения порога, иначе не попали бы в ленту.
+        """
+        recipe_ids = Recipe.objects.filter(
+            author_id=author_id
+        ).values_list('pk', flat=True)[:settings.FEED_BACKFILL_LIMIT]
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in recipe_ids
+            ),
+            ignore_conflicts=True,
+        )
+
+    def prune(self, user_id, author_id):
+        self.filter(user_id=user_id, recipe__author_id=author_id).delete()
+
+    def rebuild(self):
+        with transaction.atomic():
+            self.all().delete()
+            Recipe.objects.update(fanned_out=True)
+            recipes = Recipe.objects.order_by('pk').only('pk', 'author_id')
+            batch = []
+            for recipe in recipes.iterator(
+                chunk_size=settings.FEED_BATCH_SIZE
+            ):
+                batch.append(recipe)
+                if len(batch) >= settings.FEED_BATCH_SIZE:
+                    self.fan_out(batch)
+                    batch = []
+            self.fan_out(batch)
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Записи создаются при публикации рецепта для подписчиков автора
+    (fan-out при записи) и при подписке, удаляются при отписке
+    (сигналы recipes.signals).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+
+    objects = TimelineQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe',),
+                name='unique_user_timeline_recipe',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class RevisionQuerySet(models.QuerySet):
+
+    def bump(self, *names):
+        now = timezone.now()
+        for name in names:
+            self.update_or_create(name=name, defaults={'updated_at': now})
+
+    def stamps(self, *names):
+        """Время последнего изменения для каждого из names."""
+        stamps = dict(
+            self.filter(name__in=names).values_list('name', 'updated_at')
+        )
+        missing = [name for name in names if name not in stamps]
+        if missing:
+            self.bump(*missing)
+            stamps.update(
+                self.filter(name__in=missing).values_list(
+                    'name', 'updated_at'
+                )
+            )
+        return [stamps[name] for name in names]
+
+
+class Revision(models.Model):
+    """Время последнего изменения данных для условных GET-запросов."""
+
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Раздел',
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+    )
+
+    objects = RevisionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ревизия'
+        verbose_name_plural = 'Ревизии'
+
+    def __str__(self):
+        return f'{self.name}: {self.updated_at}'
@@ -0,0 +1,216 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from users.models import Subscription
+
+from .ingredient_index import ingredient_index
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    TimelineEntry,
+)
+
+# Отправляется после пакетных операций (bulk_create, update), которые
+# не вызывают post_save; instances - изменённые объекты модели sender
+# или None, если они неизвестны, created=True - объекты новые.
+bulk_changed = Signal()
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            [instance.user_id], instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: ингредиенты рецепта ещё не удалены каскадом.
+    ShoppingListItem.objects.remove_recipe(
+        [instance.user_id], instance.recipe_id
+    )
+
+
+def add_to_carts(recipe_id, amounts):
+    ShoppingListItem.objects.add_amounts(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        amounts,
+    )
+
+
+def get_stored_amount(pk):
+    return IngredientAmount.objects.filter(pk=pk).values(
+        'recipe_id', 'ingredient_id', 'amount'
+    ).first()
+
+
+@receiver(pre_save, sender=IngredientAmount)
+def remember_ingredient_amount(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = get_stored_amount(instance.pk)
+
+
+@receiver(post_save, sender=IngredientAmount)
+def update_ingredient_amount(sender, instance, **kwargs):
+    # Сохранение по одному объекту (админка, shell); пакетные операции
+    # RecipeWriteSerializer передают изменения в списки покупок сами.
+    previous = getattr(instance, '_previous', None)
+    if previous and (
+        previous['recipe_id'], previous['ingredient_id']
+    ) == (instance.recipe_id, instance.ingredient_id):
+        add_to_carts(
+            instance.recipe_id,
+            {instance.ingredient_id: instance.amount - previous['amount']},
+        )
+        return
+    if previous:
+        add_to_carts(
+            previous['recipe_id'],
+            {previous['ingredient_id']: -previous['amount']},
+        )
+    add_to_carts(instance.recipe_id, {instance.ingredient_id: instance.amount})
+
+
+def first_in_delete(origin, name, keys):
+    """Ключи, ещё не обработанные обработчиком name в удалении origin.
+
+    Collector шлёт сигналы удаления по каждому объекту; отметка
+    в origin позволяет обработать удаление набора одним запросом.
+    """
+    keys = set(keys)
+    if origin is None:
+        return keys
+    done = vars(origin).setdefault(f'_{name}_done', set())
+    keys -= done
+    done |= keys
+    return keys
+
+
+@receiver(pre_delete, sender=IngredientAmount)
+def delete_ingredient_amount(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении рецепта списки покупок уменьшает
+    # remove_from_shopping_list, позиции удалённого ингредиента
+    # удаляются каскадом.
+    if isinstance(origin, QuerySet):
+        if origin.model is not IngredientAmount or not first_in_delete(
+            origin, 'shopping_lists', [None]
+        ):
+            return
+        # pre_delete отправляется для всех объектов до удаления строк.
+        stored = origin.values('recipe_id', 'ingredient_id', 'amount')
+    elif isinstance(origin, IngredientAmount):
+        # Форма админки меняет поля объекта до удаления.
+        stored = [get_stored_amount(instance.pk) or {}]
+    else:
+        return
+    amounts = {}
+    for row in stored:
+        if row:
+            recipe_amounts = amounts.setdefault(row['recipe_id'], {})
+            recipe_amounts[row['ingredient_id']] = (
+                recipe_amounts.get(row['ingredient_id'], 0) - row['amount']
+            )
+    for recipe_id, recipe_amounts in amounts.items():
+        add_to_carts(recipe_id, recipe_amounts)
+
+
+def touch_recipes(recipe_ids):
+    # Новое updated_at меняет ключи кеша фрагментов и ETag рецептов.
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=IngredientAmount)
+def touch_saved_recipe_ingredients(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    touch_recipes({
+        instance.recipe_id, *([previous['recipe_id']] if previous else ())
+    })
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def touch_deleted_recipe_ingredients(sender, instance, origin=None,
+                                     **kwargs):
+    recipe_ids = first_in_delete(origin, 'touch', [instance.recipe_id])
+    if recipe_ids:
+        touch_recipes(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_recipes([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk_set)
+    elif action == 'pre_clear':
+        touch_recipes(instance.recipes.values('pk'))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).change_counter(
+            COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, **{f'{COUNTERS[sender]}__gt': 0}
+    ).change_counter(COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.fan_out([instance])
+
+
+@receiver(bulk_changed, sender=Recipe)
+def fan_out_recipes(sender, instances=None, created=False, **kwargs):
+    if created and instances:
+        TimelineEntry.objects.fan_out(instances)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(bulk_changed, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
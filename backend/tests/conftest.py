@@ -0,0 +1,125 @@
+import base64
+import io
+
+import pytest
+from django.core.cache import cache
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Откат транзакции теста не отправляет сигналы инвалидации.
+    cache.clear()
+    token_cache.clear()
+    ingredient_index.invalidate()
+    yield
+    cache.clear()
+    token_cache.clear()
+    ingredient_index.invalidate()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(number):
+        return User.objects.create_user(
+            email=f'user{number}@example.com',
+            username=f'user{number}',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-12345',
+        )
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user(1)
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user(2)
+
+
+@pytest.fixture
+def make_client():
+    def make_client(user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+    return make_client
+
+
+@pytest.fixture
+def user_client(make_client, user):
+    return make_client(user)
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                           slug=f'tag{number}')
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=f'Ингредиент {number}',
+                                  measurement_unit='г')
+        for number in range(10)
+    ]
+
+
+@pytest.fixture
+def make_recipe(author, tags, ingredients):
+    def make_recipe(number, author=author, tags=tags[:1], amounts=(1, 2)):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {number}',
+            text='Текст',
+            cooking_time=10,
+        )
+        recipe.tags.set(tags)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in zip(ingredients, amounts)
+        )
+        return recipe
+    return make_recipe
+
+
+@pytest.fixture
+def recipe_data(tags, ingredients):
+    return {
+        'name': 'Новый рецепт',
+        'text': 'Текст',
+        'cooking_time': 15,
+        'image': make_image(),
+        'tags': [tags[0].pk],
+        'ingredients': [
+            {'id': ingredients[0].pk, 'amount': 10},
+            {'id': ingredients[1].pk, 'amount': 20},
+        ],
+    }
@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# Без переменных окружения тесты идут на SQLite; ENGINE=... в
+# окружении запускает их на PostgreSQL.
+os.environ.setdefault('ENGINE', 'django.db.backends.sqlite3')
+os.environ.setdefault('DB_NAME', 'foodgram')
+
+from foodgram.settings import *  # noqa: E402,F401,F403
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-tests-')
+PASSWORD_HASHERS = ('django.contrib.auth.hashers.MD5PasswordHasher',)
+
+# Бюджеты SQL-запросов ProfilingMiddleware проверяются в каждом тесте.
+PROFILING_ENABLED = True
+QUERY_BUDGET_ACTION = 'raise'
@@ -0,0 +1,83 @@
+import pickle
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.authentication import TokenCache, get_shared_key, token_cache
+
+
+@pytest.mark.django_db
+class TestSharedTokenCache:
+
+    @pytest.fixture(autouse=True)
+    def shared_cache(self, settings):
+        settings.AUTH_TOKEN_SHARED_CACHE = 'default'
+
+    def test_no_secrets_in_shared_cache(self, user, user_client):
+        assert user_client.get('/api/users/me/').status_code == 200
+        key = Token.objects.get(user=user).key
+        data = cache.get(get_shared_key(key))
+        assert data['user']['id'] == user.pk
+        dump = pickle.dumps(data)
+        assert key.encode() not in dump
+        assert user.password.encode() not in dump
+        assert 'password' not in data['user']
+
+    def test_shared_hit_skips_token_query(self, user, user_client):
+        user_client.get('/api/users/me/')
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get('/api/users/me/')
+        assert response.status_code == 200
+        assert response.json()['email'] == user.email
+        assert not any(
+            'authtoken_token' in query['sql']
+            for query in context.captured_queries
+        )
+
+    def test_shared_user_loads_password_lazily(self, user, user_client):
+        from api.authentication import CachedTokenAuthentication
+
+        user_client.get('/api/users/me/')
+        token_cache.clear()
+        key = Token.objects.get(user=user).key
+        cached_user, token = (
+            CachedTokenAuthentication().authenticate_credentials(key)
+        )
+        assert token.key == key
+        assert cached_user.pk == user.pk
+        assert 'password' in cached_user.get_deferred_fields()
+        assert cached_user.check_password('password-12345')
+
+    def test_logout_invalidates(self, user, user_client,
+                                django_capture_on_commit_callbacks):
+        user_client.get('/api/users/me/')
+        with django_capture_on_commit_callbacks(execute=True):
+            assert user_client.post(
+                '/api/auth/token/logout/'
+            ).status_code == 204
+        assert user_client.get('/api/users/me/').status_code == 401
+
+    @pytest.mark.parametrize('revoke', ('logout', 'deactivate'))
+    def test_revoke_in_other_process(self, user, make_client, monkeypatch,
+                                     revoke,
+                                     django_capture_on_commit_callbacks):
+        client = make_client(user)
+        assert client.get('/api/users/me/').status_code == 200
+        # Второй воркер: свой LRU токенов, общий кеш тот же.
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                'api.authentication.token_cache', TokenCache(16, 30)
+            )
+            with django_capture_on_commit_callbacks(execute=True):
+                if revoke == 'logout':
+                    assert client.post(
+                        '/api/auth/token/logout/'
+                    ).status_code == 204
+                else:
+                    user.is_active = False
+                    user.save()
+        assert client.get('/api/users/me/').status_code == 401
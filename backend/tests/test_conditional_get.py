@@ -0,0 +1,89 @@
+import pytest
+
+from recipes.models import Favorite
+
+
+def get(client, url, params=None, **headers):
+    return client.get(url, params or {}, **headers)
+
+
+@pytest.mark.django_db
+class TestCatalogConditionalGet:
+
+    @pytest.mark.parametrize('url, params', (
+        ('/api/tags/', None),
+        ('/api/ingredients/', None),
+        ('/api/ingredients/', {'name': 'Ингр'}),
+    ))
+    def test_not_modified(self, user_client, tags, ingredients, url, params):
+        response = get(user_client, url, params)
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert response['Last-Modified']
+        response = get(user_client, url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert not response.content
+
+    def test_tag_change(self, user_client, tags):
+        etag = get(user_client, '/api/tags/')['ETag']
+        tags[0].name = 'Новое имя'
+        tags[0].save()
+        response = get(user_client, '/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    @pytest.mark.parametrize('params', (None, {'name': 'Ингр'}))
+    def test_ingredient_change(self, user_client, ingredients, params):
+        url = '/api/ingredients/'
+        etag = get(user_client, url, params)['ETag']
+        ingredients[0].name = 'Ингредиент новый'
+        ingredients[0].save()
+        response = get(user_client, url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert 'Ингредиент новый' in {
+            item['name'] for item in response.json()
+        }
+
+
+@pytest.mark.django_db
+class TestRecipeConditionalGet:
+
+    def test_not_modified(self, user_client, make_recipe):
+        url = f'/api/recipes/{make_recipe(1).pk}/'
+        etag = get(user_client, url)['ETag']
+        response = get(user_client, url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    def test_anonymous_if_modified_since(self, make_client, make_recipe):
+        client = make_client()
+        url = f'/api/recipes/{make_recipe(1).pk}/'
+        last_modified = get(client, url)['Last-Modified']
+        response = get(client, url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_favorite_changes_etag(self, user, user_client, make_recipe):
+        recipe = make_recipe(1)
+        url = f'/api/recipes/{recipe.pk}/'
+        etag = get(user_client, url)['ETag']
+        Favorite.objects.create(user=user, recipe=recipe)
+        response = get(user_client, url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['is_favorited'] is True
+
+    def test_recipe_edit_changes_etag(self, make_client, author,
+                                      make_recipe):
+        client = make_client(author)
+        recipe = make_recipe(1)
+        url = f'/api/recipes/{recipe.pk}/'
+        etag = get(client, url)['ETag']
+        assert client.patch(
+            url, {'cooking_time': 99}, format='json'
+        ).status_code == 200
+        response = get(client, url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['cooking_time'] == 99
+
+    def test_unknown_recipe(self, user_client):
+        assert get(user_client, '/api/recipes/999/').status_code == 404
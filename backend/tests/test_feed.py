@@ -0,0 +1,81 @@
+import pytest
+from django.test import override_settings
+
+from recipes.models import Recipe, TimelineEntry
+
+
+def feed_ids(client, **params):
+    response = client.get('/api/recipes/feed/', {'limit': 50, **params})
+    assert response.status_code == 200, response.content
+    return [item['id'] for item in response.json()['results']]
+
+
+@pytest.mark.django_db
+class TestSubscriptionFeed:
+
+    def test_feed_requires_auth(self, make_client):
+        assert make_client().get('/api/recipes/feed/').status_code == 401
+
+    def test_feed_without_ordering(self, user_client, author, make_recipe):
+        user_client.post(f'/api/users/{author.pk}/subscribe/')
+        recipes = [make_recipe(number) for number in range(3)]
+        response = user_client.get('/api/recipes/feed/', {'limit': 2})
+        assert response.status_code == 200
+        data = response.json()
+        assert [item['id'] for item in data['results']] == [
+            recipes[2].pk, recipes[1].pk
+        ]
+        response = user_client.get(data['next'])
+        assert [item['id'] for item in response.json()['results']] == [
+            recipes[0].pk
+        ]
+
+    def test_fan_out_backfill_and_prune(self, user, user_client, author,
+                                        make_user, make_recipe):
+        old = make_recipe(1)
+        other = make_recipe(2, author=make_user(3))
+        user_client.post(f'/api/users/{author.pk}/subscribe/')
+        assert feed_ids(user_client) == [old.pk]
+        new = make_recipe(3)
+        assert feed_ids(user_client) == [new.pk, old.pk]
+        assert other.pk not in feed_ids(user_client)
+        response = user_client.delete(f'/api/users/{author.pk}/subscribe/')
+        assert response.status_code == 204
+        assert feed_ids(user_client) == []
+        assert not TimelineEntry.objects.filter(user=user).exists()
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_celebrity_recipes_survive_threshold(self, make_client,
+                                                 make_user, author,
+                                                 make_recipe):
+        clients = [make_client(make_user(10 + number)) for number in range(2)]
+        for client in clients:
+            client.post(f'/api/users/{author.pk}/subscribe/')
+        recipe = make_recipe(1)
+        assert not Recipe.objects.get(pk=recipe.pk).fanned_out
+        assert not TimelineEntry.objects.filter(recipe=recipe).exists()
+        assert feed_ids(clients[0]) == [recipe.pk]
+        # Автор опускается ниже порога: рецепт читается по fanned_out.
+        clients[1].delete(f'/api/users/{author.pk}/subscribe/')
+        assert feed_ids(clients[0]) == [recipe.pk]
+        assert feed_ids(clients[1]) == []
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_new_follower_of_celebrity_gets_backfill(self, make_client,
+                                                     make_user, author,
+                                                     make_recipe):
+        before = make_recipe(1)
+        clients = [make_client(make_user(10 + number)) for number in range(3)]
+        for client in clients:
+            client.post(f'/api/users/{author.pk}/subscribe/')
+        after = make_recipe(2)
+        assert feed_ids(clients[2]) == [after.pk, before.pk]
+
+    def test_rebuild(self, user_client, author, make_recipe):
+        user_client.post(f'/api/users/{author.pk}/subscribe/')
+        recipes = [make_recipe(number) for number in range(3)]
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.rebuild()
+        assert feed_ids(user_client) == [
+            recipe.pk for recipe in reversed(recipes)
+        ]
@@ -0,0 +1,115 @@
+import itertools
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+@pytest.fixture
+def recipes(make_user, make_recipe, tags, user, user_client):
+    authors = [make_user(100 + number) for number in range(2)]
+    recipes = [
+        make_recipe(number, author=authors[number % 2],
+                    tags=tags[number % 3:number % 3 + 1 + number % 2])
+        for number in range(9)
+    ]
+    for recipe in recipes[::2]:
+        user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    for recipe in recipes[::3]:
+        user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    return recipes
+
+
+def expected(recipes, user, tags=(), author=None, is_favorited=False,
+             is_in_shopping_cart=False):
+    favorited = set(
+        Favorite.objects.filter(user=user).values_list('recipe_id', flat=True)
+    )
+    in_cart = set(
+        ShoppingCart.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    result = []
+    for recipe in sorted(recipes, key=lambda recipe: -recipe.pk):
+        slugs = {tag.slug for tag in recipe.tags.all()}
+        if tags and not slugs & set(tags):
+            continue
+        if author is not None and recipe.author_id != author:
+            continue
+        if is_favorited and recipe.pk not in favorited:
+            continue
+        if is_in_shopping_cart and recipe.pk not in in_cart:
+            continue
+        result.append(recipe.pk)
+    return result
+
+
+def filter_combinations(recipes, tags):
+    options = {
+        'tags': [tag.slug for tag in tags[:2]],
+        'author': recipes[1].author_id,
+        'is_favorited': 1,
+        'is_in_shopping_cart': 1,
+    }
+    for size in range(len(options) + 1):
+        for names in itertools.combinations(options, size):
+            yield {name: options[name] for name in names}
+
+
+@pytest.mark.django_db
+class TestRecipeFilterCombinations:
+
+    def test_results(self, recipes, tags, user, user_client):
+        for params in filter_combinations(recipes, tags):
+            response = user_client.get(
+                '/api/recipes/', {**params, 'limit': 50}
+            )
+            assert response.status_code == 200
+            assert [item['id'] for item in response.json()['results']] == (
+                expected(recipes, user, **params)
+            ), params
+
+    def test_query_count_and_sql(self, recipes, tags, user_client):
+        for params in filter_combinations(recipes, tags):
+            if not user_client.get('/api/recipes/', params).json()['count']:
+                continue
+            with CaptureQueriesContext(connection) as context:
+                user_client.get('/api/recipes/', {**params, 'page': 1})
+            # COUNT, страница рецептов и штампы Revision для ключей
+            # фрагментов плюс по запросу на проверку значений tags и
+            # author формой фильтра, независимо от числа рецептов.
+            lookups = len({'tags', 'author'} & set(params))
+            assert len(context) == 3 + lookups, params
+            main = [
+                query['sql'] for query in context.captured_queries
+                if 'FROM "recipes_recipe"' in query['sql']
+            ]
+            assert len(main) == 2, params
+            for sql in main:
+                assert 'DISTINCT' not in sql, params
+                assert 'JOIN "recipes_recipe_tags"' not in sql, params
+                assert 'JOIN "recipes_favorite"' not in sql, params
+                assert 'JOIN "recipes_shoppingcart"' not in sql, params
+
+    @pytest.mark.skipif(
+        connection.vendor != 'sqlite', reason='формат EXPLAIN SQLite'
+    )
+    def test_plan_uses_indexes(self, recipes, tags, user):
+        queryset = Recipe.objects.for_feed(user).filter_tags(
+            tags[:2]
+        ).filter(is_favorited=True, is_in_shopping_cart=True)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # Подзапросы EXISTS идут по уникальным индексам связей,
+        # без полного просмотра таблиц избранного, корзин и тегов.
+        for table in (
+            'recipes_favorite', 'recipes_shoppingcart', 'recipes_recipe_tags'
+        ):
+            steps = [step for step in plan if table in step]
+            assert steps, (table, plan)
+            assert all('INDEX' in step for step in steps), (table, plan)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.models import Ingredient
+
+ROWS = [
+    ('мука', 'г'),
+    ('молоко', 'мл'),
+    ('яйца', 'шт.'),
+    ('мука', 'кг'),
+]
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'name,measurement_unit\n'
+        + ''.join(f'{name},{unit}\n' for name, unit in ROWS),
+        encoding='utf-8',
+    )
+    return path
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps(
+        [{'name': name, 'measurement_unit': unit} for name, unit in ROWS],
+        ensure_ascii=False,
+    ), encoding='utf-8')
+    return path
+
+
+def imported():
+    return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+
+@pytest.mark.django_db
+class TestImportIngredients:
+
+    @pytest.mark.parametrize('batch_size', (1, 3, 1000))
+    def test_csv(self, csv_file, batch_size):
+        call_command(
+            'import_ingredients', str(csv_file), batch_size=batch_size
+        )
+        assert imported() == set(ROWS)
+
+    def test_json(self, json_file):
+        call_command('import_ingredients', str(json_file), batch_size=2)
+        assert imported() == set(ROWS)
+
+    def test_json_without_extension(self, json_file, tmp_path):
+        path = tmp_path / 'ingredients'
+        path.write_text(json_file.read_text(encoding='utf-8'),
+                        encoding='utf-8')
+        call_command('import_ingredients', str(path))
+        assert imported() == set(ROWS)
+
+    def test_reimport_is_idempotent(self, csv_file, json_file, capsys):
+        call_command('import_ingredients', str(csv_file))
+        ids = set(Ingredient.objects.values_list('id', flat=True))
+        call_command('import_ingredients', str(csv_file))
+        call_command('import_ingredients', str(json_file))
+        assert set(Ingredient.objects.values_list('id', flat=True)) == ids
+        assert 'новых 0' in capsys.readouterr().out.splitlines()[-1]
+
+    def test_invalid_rows_skipped(self, tmp_path):
+        path = tmp_path / 'ingredients.csv'
+        path.write_text(
+            'name,measurement_unit\nсоль,г\n,г\nперец,\n', encoding='utf-8'
+        )
+        call_command('import_ingredients', str(path))
+        assert imported() == {('соль', 'г')}
+
+    @pytest.mark.parametrize('batch_size', (0, -1))
+    def test_batch_size_must_be_positive(self, csv_file, batch_size):
+        with pytest.raises(CommandError):
+            call_command(
+                'import_ingredients', str(csv_file), batch_size=batch_size
+            )
+        assert not Ingredient.objects.exists()
+
+    def test_truncated_json(self, tmp_path):
+        path = tmp_path / 'ingredients.json'
+        path.write_text('[{"name": "соль", "measurement_unit": "г"}, {"na',
+                        encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command('import_ingredients', str(path))
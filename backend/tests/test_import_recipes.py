@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from recipes.bulk import RecipeImporter
+from recipes.models import IngredientAmount, Recipe
+
+
+@pytest.fixture
+def make_line(tags, ingredients):
+    def make_line(number, cooking_time=5, amount=3):
+        return json.dumps({
+            'name': f'Импорт {number}',
+            'text': 'Текст',
+            'cooking_time': cooking_time,
+            'tags': [tags[0].slug],
+            'ingredients': [{
+                'name': ingredients[0].name,
+                'measurement_unit': ingredients[0].measurement_unit,
+                'amount': amount,
+            }],
+        })
+    return make_line
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('field', ('cooking_time', 'amount'))
+@pytest.mark.parametrize('value', (True, False))
+def test_bool_is_not_integer(user, make_line, field, value):
+    importer = RecipeImporter(user).run([make_line(1, **{field: value})])
+    assert importer.created == 0
+    assert [error['line'] for error in importer.errors] == [1]
+    assert not Recipe.objects.exists()
+
+
+@pytest.mark.django_db
+def test_failed_row_does_not_fail_batch(user, make_line, monkeypatch):
+    build = RecipeImporter.build
+
+    def build_with_race(self, row):
+        # Рецепт с тем же названием появился после проверки имён.
+        if row['name'] == 'Импорт 2':
+            Recipe.objects.create(
+                author=user, name=row['name'], text='Текст', cooking_time=1
+            )
+        return build(self, row)
+
+    monkeypatch.setattr(RecipeImporter, 'build', build_with_race)
+    importer = RecipeImporter(user).run(
+        [make_line(number) for number in range(1, 4)]
+    )
+    assert importer.created == 2
+    assert [error['line'] for error in importer.errors] == [2]
+    assert importer.errors[0]['errors'].startswith('Ошибка записи')
+    imported = Recipe.objects.filter(name__in=['Импорт 1', 'Импорт 3'])
+    assert imported.count() == 2
+    assert IngredientAmount.objects.filter(recipe__in=imported).count() == 2
+    assert not IngredientAmount.objects.filter(
+        recipe__name='Импорт 2'
+    ).exists()
@@ -0,0 +1,28 @@
+import pytest
+
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db
+class TestIngredientNameSearch:
+
+    def test_names_differing_in_case(self, user_client):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Соль', 'соль', 'соль морская')
+        )
+        response = user_client.get('/api/ingredients/', {'name': 'сол'})
+        assert response.status_code == 200
+        assert [item['name'] for item in response.json()] == [
+            'Соль', 'соль', 'соль морская'
+        ]
+
+    def test_exact_match_first(self, user_client):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука пшеничная', 'мука', 'овсяная мука')
+        )
+        response = user_client.get('/api/ingredients/', {'name': 'мука'})
+        assert [item['name'] for item in response.json()] == [
+            'мука', 'мука пшеничная', 'овсяная мука'
+        ]
@@ -0,0 +1,68 @@
+import re
+import socket
+
+import pytest
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+
+
+def run_load_test(capsys, *args):
+    call_command('load_test', *args)
+    return capsys.readouterr().out
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test(live_server, tags, capsys):
+    out = run_load_test(
+        capsys, live_server.url,
+        '--path', '/api/tags/', '--path', '/api/ingredients/',
+        '--requests', '20', '--concurrency', '4',
+    )
+    assert 'Запросов: 20, ошибок: 0' in out
+    assert re.search(r'p50 [\d.]+ мс, p95 [\d.]+ мс, max [\d.]+ мс', out)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_counts_errors(live_server, capsys):
+    # Ответы 4xx считаются ошибками наравне с недоступным сервером.
+    out = run_load_test(
+        capsys, live_server.url, '--path', '/api/users/me/',
+        '--requests', '4', '--concurrency', '2',
+    )
+    assert 'Запросов: 4, ошибок: 4' in out
+    assert 'p50' not in out
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_with_token(live_server, user, capsys):
+    token = Token.objects.create(user=user)
+    out = run_load_test(
+        capsys, live_server.url, '--path', '/api/users/me/',
+        '--requests', '4', '--concurrency', '2', '--token', token.key,
+    )
+    assert 'Запросов: 4, ошибок: 0' in out
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_compares_servers(live_server, tags, capsys):
+    out = run_load_test(
+        capsys, live_server.url, live_server.url + '/',
+        '--path', '/api/tags/', '--requests', '4', '--concurrency', '2',
+    )
+    lines = out.splitlines()
+    assert lines[0] == live_server.url
+    assert lines.index(live_server.url + '/') > 0
+    assert out.count('Запросов: 4, ошибок: 0') == 2
+
+
+def test_load_test_timeout(capsys):
+    # Сервер принимает соединения в очередь, но не отвечает.
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen(8)
+        host, port = server.getsockname()
+        out = run_load_test(
+            capsys, f'http://{host}:{port}', '--path', '/api/tags/',
+            '--requests', '2', '--concurrency', '2', '--timeout', '0.2',
+        )
+    assert 'Запросов: 2, ошибок: 2' in out
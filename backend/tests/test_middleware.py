@@ -0,0 +1,87 @@
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+
+from api.middleware import QueryBudgetExceeded, metrics
+from recipes.models import ShoppingCart
+
+
+def parse_server_timing(response):
+    return {
+        match['name']: (float(match['dur']), match['desc'])
+        for match in re.finditer(
+            r'(?P<name>\w+);dur=(?P<dur>[\d.]+)(?:;desc="(?P<desc>[^"]*)")?',
+            response['Server-Timing'],
+        )
+    }
+
+
+def metric(name, view):
+    return metrics.values[name][view]
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+
+    def test_server_timing(self, user_client, make_recipe):
+        for number in range(3):
+            make_recipe(number)
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get('/api/recipes/')
+        timing = parse_server_timing(response)
+        assert set(timing) == {'db', 'ser', 'app', 'total'}
+        assert timing['db'][1] == f'{len(context)} SQL'
+        assert timing['ser'][0] > 0
+        assert timing['total'][0] >= timing['app'][0]
+
+    def test_metrics(self, user_client):
+        requests = metric('requests_total', 'tags-list')
+        response = user_client.get('/api/tags/')
+        assert metric('requests_total', 'tags-list') == requests + 1
+        assert metric('response_bytes_total', 'tags-list') >= len(
+            response.content
+        )
+        rendered = metrics.render()
+        assert 'foodgram_serializer_seconds_total{view="tags-list"}' in (
+            rendered
+        )
+
+    def test_budget_raises(self, user_client, settings):
+        settings.QUERY_BUDGETS = {'GET tags-list': 0}
+        with pytest.raises(QueryBudgetExceeded):
+            user_client.get('/api/tags/')
+
+    def test_budget_logs(self, user_client, settings, caplog):
+        settings.QUERY_BUDGETS = {'tags-list': 0}
+        settings.QUERY_BUDGET_ACTION = 'log'
+        exceeded = metric('query_budget_exceeded_total', 'tags-list')
+        with caplog.at_level(logging.WARNING, logger='api.middleware'):
+            assert user_client.get('/api/tags/').status_code == 200
+        assert 'при бюджете 0' in caplog.text
+        assert metric(
+            'query_budget_exceeded_total', 'tags-list'
+        ) == exceeded + 1
+
+    def test_streaming_size(self, user, user_client, make_recipe):
+        ShoppingCart.objects.create(user=user, recipe=make_recipe(1))
+        view = 'recipes-download-shopping-cart'
+        size = metric('response_bytes_total', view)
+        response = user_client.get('/api/recipes/download_shopping_cart/')
+        assert response.streaming
+        body = b''.join(response.streaming_content)
+        assert body
+        assert metric('response_bytes_total', view) == size + len(body)
+
+    def test_async_request(self):
+        async def get():
+            return await AsyncClient().get('/api/tags/')
+
+        response = async_to_sync(get)()
+        assert response.status_code == 200
+        timing = parse_server_timing(response)
+        assert timing['db'][1] != '0 SQL'
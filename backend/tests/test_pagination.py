@@ -0,0 +1,75 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from foodgram import pagination
+from foodgram.pagination import CountStrategyPaginator, estimate_count
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def estimates(monkeypatch):
+    """Подменяет оценку планировщика и считает вызовы EXPLAIN."""
+    calls = []
+
+    def install(value):
+        def fake_estimate(queryset):
+            calls.append(queryset)
+            return value
+        monkeypatch.setattr(pagination, 'estimate_count', fake_estimate)
+        return calls
+    return install
+
+
+@pytest.fixture
+def recipes(make_recipe):
+    return [make_recipe(number) for number in range(3)]
+
+
+@pytest.mark.django_db
+class TestCountStrategyPaginator:
+
+    def paginate(self, user_client, **params):
+        response = user_client.get('/api/recipes/', params)
+        assert response.status_code == 200
+        return response.json()
+
+    def test_exact_count(self, user_client, recipes, estimates):
+        calls = estimates(2)
+        for _ in range(2):
+            data = self.paginate(user_client)
+            assert data['count'] == 3
+            assert data['count_is_approximate'] is False
+        # Оценка ниже порога кешируется: EXPLAIN выполняется один раз.
+        assert len(calls) == 1
+
+    def test_approximate_count(self, user_client, recipes, estimates,
+                               monkeypatch):
+        monkeypatch.setattr(CountStrategyPaginator, 'estimate_threshold', 10)
+        calls = estimates(5000)
+        with CaptureQueriesContext(connection) as context:
+            data = self.paginate(user_client)
+        assert data['count'] == 5000
+        assert data['count_is_approximate'] is True
+        assert not any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        )
+        assert self.paginate(user_client)['count_is_approximate'] is True
+        assert len(calls) == 1
+
+    def test_large_exact_count_cached(self, user_client, recipes,
+                                      monkeypatch):
+        monkeypatch.setattr(CountStrategyPaginator, 'estimate_threshold', 2)
+        assert self.paginate(user_client)['count'] == 3
+        Recipe.objects.filter(pk=recipes[0].pk).delete()
+        # Значения не меньше порога кешируются на cache_timeout.
+        data = self.paginate(user_client)
+        assert data['count'] == 3
+        assert data['count_is_approximate'] is False
+
+    def test_estimate_skipped_on_sqlite(self, recipes):
+        if connection.vendor == 'postgresql':
+            pytest.skip('оценка планировщика PostgreSQL')
+        with CaptureQueriesContext(connection) as context:
+            assert estimate_count(Recipe.objects.all()) is None
+        assert len(context) == 0
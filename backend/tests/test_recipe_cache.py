@@ -0,0 +1,80 @@
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from recipes.models import IngredientAmount
+
+
+@pytest.mark.django_db
+class TestRecipeInvalidation:
+
+    def get_detail(self, client, recipe, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return client.get(f'/api/recipes/{recipe.pk}/', **headers)
+
+    @pytest.mark.parametrize('authenticated', (False, True))
+    def test_ingredient_amount_edit(self, make_client, user, make_recipe,
+                                    authenticated,
+                                    django_capture_on_commit_callbacks):
+        client = make_client(user if authenticated else None)
+        recipe = make_recipe(1, amounts=(1,))
+        response = self.get_detail(client, recipe)
+        etag = response['ETag']
+        assert response.json()['ingredients'][0]['amount'] == 1
+        assert self.get_detail(client, recipe, etag).status_code == 304
+        item = IngredientAmount.objects.get(recipe=recipe)
+        item.amount = 50
+        # Кеш ответов анонимам сбрасывается в transaction.on_commit.
+        with django_capture_on_commit_callbacks(execute=True):
+            item.save()
+        response = self.get_detail(client, recipe, etag)
+        assert response.status_code == 200
+        assert response.json()['ingredients'][0]['amount'] == 50
+        list_response = client.get('/api/recipes/')
+        assert list_response.json()['results'][0]['ingredients'][0][
+            'amount'
+        ] == 50
+
+    def test_ingredient_amount_delete(self, user_client, make_recipe):
+        recipe = make_recipe(1, amounts=(1, 2))
+        etag = self.get_detail(user_client, recipe)['ETag']
+        IngredientAmount.objects.filter(recipe=recipe).first().delete()
+        response = self.get_detail(user_client, recipe, etag)
+        assert response.status_code == 200
+        assert len(response.json()['ingredients']) == 1
+
+    def test_tag_changes(self, user_client, make_recipe, tags):
+        recipe = make_recipe(1, tags=tags[:1])
+        etag = self.get_detail(user_client, recipe)['ETag']
+        recipe.tags.add(tags[1])
+        response = self.get_detail(user_client, recipe, etag)
+        assert response.status_code == 200
+        assert len(response.json()['tags']) == 2
+        etag = response['ETag']
+        tags[1].recipes.clear()
+        response = self.get_detail(user_client, recipe, etag)
+        assert response.status_code == 200
+        assert len(response.json()['tags']) == 1
+
+    def test_tag_edit_in_another_process(self, user_client, make_recipe,
+                                         tags, monkeypatch,
+                                         django_capture_on_commit_callbacks):
+        recipe = make_recipe(1, tags=tags[:1])
+        response = self.get_detail(user_client, recipe)
+        etag = response['ETag']
+        assert user_client.get('/api/recipes/').json()['results'][0][
+            'tags'
+        ][0]['name'] == tags[0].name
+        # Другой воркер gunicorn со своим LocMemCache: версии кеша
+        # повышаются только в нём, общей остаётся база.
+        with monkeypatch.context() as patch:
+            patch.setattr('api.cache.cache', LocMemCache('worker-2', {}))
+            with django_capture_on_commit_callbacks(execute=True):
+                tags[0].name = 'Новое имя'
+                tags[0].save()
+        response = self.get_detail(user_client, recipe, etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['tags'][0]['name'] == 'Новое имя'
+        assert user_client.get('/api/recipes/').json()['results'][0][
+            'tags'
+        ][0]['name'] == 'Новое имя'
@@ -0,0 +1,69 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def count_queries(client, path, params, cold=True):
+    if cold:
+        cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(path, params)
+    assert response.status_code == 200, response.content
+    return len(context)
+
+
+@pytest.fixture
+def feed(make_user, make_client, make_recipe, tags, user):
+    """Рецепты разных авторов в избранном, корзине и подписках user."""
+    client = make_client(user)
+    recipes = []
+    for number in range(12):
+        author = make_user(100 + number)
+        recipe = make_recipe(number, author=author, tags=tags[:1 + number % 3],
+                             amounts=range(1, 2 + number % 5))
+        recipes.append(recipe)
+        if number % 2:
+            client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        if number % 3:
+            client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        if number % 4:
+            client.post(f'/api/users/{author.pk}/subscribe/')
+    return recipes
+
+
+@pytest.mark.django_db
+class TestRecipeListQueries:
+
+    @pytest.mark.parametrize('authenticated', (False, True))
+    @pytest.mark.parametrize('cold', (True, False))
+    def test_constant_for_page_size(self, feed, make_client, user,
+                                    authenticated, cold):
+        client = make_client(user if authenticated else None)
+        counts = set()
+        for limit in (1, 5, 12):
+            params = {'limit': limit}
+            if not cold:
+                # Прогрев кеша фрагментов, анонимам - с обходом кеша
+                # ответов через новый параметр.
+                client.get('/api/recipes/', params)
+                params['page'] = 1
+            counts.add(
+                count_queries(client, '/api/recipes/', params, cold=cold)
+            )
+        assert len(counts) == 1, counts
+
+    def test_constant_for_cursor_pages(self, feed, user_client):
+        counts = {
+            count_queries(
+                user_client, '/api/recipes/',
+                {'pagination': 'cursor', 'limit': limit},
+            )
+            for limit in (1, 5, 12)
+        }
+        assert len(counts) == 1, counts
+
+    def test_detail(self, feed, user_client, django_assert_max_num_queries):
+        with django_assert_max_num_queries(5):
+            response = user_client.get(f'/api/recipes/{feed[5].pk}/')
+        assert response.status_code == 200
@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import ShoppingCart
+
+
+@pytest.mark.django_db
+class TestRecipeUpdateQueries:
+
+    def patch(self, client, recipe, ingredients):
+        with CaptureQueriesContext(connection) as context:
+            response = client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'ingredients': ingredients}, format='json',
+            )
+        assert response.status_code == 200
+        return response, len(context)
+
+    def test_query_count_does_not_depend_on_diff_size(
+        self, make_client, author, user, make_recipe, ingredients
+    ):
+        client = make_client(author)
+        counts = set()
+        for size in (1, 3):
+            recipe = make_recipe(size, amounts=(1,) * 6)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            # Без изменений, с новым количеством, удалённые (не в payload)
+            # и добавленные ингредиенты: size штук каждого вида.
+            kept = ingredients[:6 - 2 * size]
+            changed = ingredients[6 - 2 * size:6 - size]
+            added = ingredients[6:6 + size]
+            payload = [
+                *({'id': item.pk, 'amount': 1} for item in kept),
+                *({'id': item.pk, 'amount': 5} for item in changed),
+                *({'id': item.pk, 'amount': 7} for item in added),
+            ]
+            response, count = self.patch(client, recipe, payload)
+            counts.add(count)
+            amounts = {
+                item['id']: item['amount']
+                for item in response.json()['ingredients']
+            }
+            assert amounts == {item['id']: item['amount'] for item in payload}
+        assert len(counts) == 1, counts
+
+    def test_unchanged_ingredients_are_not_written(
+        self, make_client, author, make_recipe, ingredients
+    ):
+        client = make_client(author)
+        recipe = make_recipe(1, amounts=(1, 2))
+        payload = [
+            {'id': ingredients[0].pk, 'amount': 1},
+            {'id': ingredients[1].pk, 'amount': 2},
+        ]
+        self.patch(client, recipe, payload)
+        with CaptureQueriesContext(connection) as context:
+            self.patch(client, recipe, payload)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_ingredientamount' in query['sql']
+            and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        assert writes == []
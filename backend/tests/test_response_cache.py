@@ -0,0 +1,80 @@
+import pytest
+
+from users.models import User
+
+STATS_URL = '/api/cache/stats/'
+
+
+@pytest.fixture
+def admin_client(make_client):
+    return make_client(User.objects.create_superuser(
+        email='admin@example.com', username='admin', first_name='Админ',
+        last_name='Админ', password='password-12345',
+    ))
+
+
+@pytest.mark.django_db
+class TestAnonymousResponseCache:
+
+    @pytest.mark.parametrize('url', (
+        '/api/recipes/', '/api/tags/', '/api/ingredients/',
+    ))
+    def test_hit(self, make_client, make_recipe, url):
+        make_recipe(1)
+        client = make_client()
+        first = client.get(url)
+        assert first['X-Cache'] == 'MISS'
+        second = client.get(url)
+        assert second['X-Cache'] == 'HIT'
+        assert second.json() == first.json()
+
+    def test_query_params_in_key(self, make_client, make_recipe, tags):
+        make_recipe(1, tags=tags[:1])
+        client = make_client()
+        assert client.get('/api/recipes/')['X-Cache'] == 'MISS'
+        response = client.get('/api/recipes/', {'tags': tags[1].slug})
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['count'] == 0
+
+    def test_authenticated_bypass(self, user_client):
+        response = user_client.get('/api/tags/')
+        assert response.status_code == 200
+        assert 'X-Cache' not in response
+        assert 'X-Cache' not in user_client.get('/api/tags/')
+
+    def test_invalidated_on_write(self, make_client, author, recipe_data,
+                                  django_capture_on_commit_callbacks):
+        client = make_client()
+        assert client.get('/api/recipes/').json()['count'] == 0
+        assert client.get('/api/recipes/')['X-Cache'] == 'HIT'
+        with django_capture_on_commit_callbacks(execute=True):
+            assert make_client(author).post(
+                '/api/recipes/', recipe_data, format='json'
+            ).status_code == 201
+        response = client.get('/api/recipes/')
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['count'] == 1
+
+
+@pytest.mark.django_db
+class TestResponseCacheStats:
+
+    def test_counters(self, make_client, admin_client):
+        client = make_client()
+        for _ in range(3):
+            client.get('/api/tags/')
+        stats = admin_client.get(STATS_URL).json()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == pytest.approx(2 / 3)
+        # Бэкенд по умолчанию - LocMemCache процесса.
+        assert stats['per_process'] is True
+
+    def test_empty(self, admin_client):
+        stats = admin_client.get(STATS_URL).json()
+        assert stats['hits'] == stats['misses'] == 0
+        assert stats['hit_rate'] is None
+
+    def test_admin_only(self, make_client, user_client):
+        assert make_client().get(STATS_URL).status_code == 401
+        assert user_client.get(STATS_URL).status_code == 403
@@ -0,0 +1,63 @@
+import pytest
+from django.db import connection
+
+from recipes.models import Ingredient, Recipe
+
+SEARCH_TABLES = ('recipes_ingredient', 'recipes_recipe')
+
+sqlite_only = pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='FTS5 используется только в SQLite'
+)
+
+
+@pytest.mark.django_db
+class TestNameSearch:
+
+    def test_new_recipe_is_found(self, user_client, make_recipe):
+        recipe = make_recipe(1)
+        recipe.name = 'Шарлотка с яблоками'
+        recipe.save()
+        make_recipe(2)
+        response = user_client.get('/api/recipes/', {'search': 'яблок'})
+        assert [item['id'] for item in response.json()['results']] == [
+            recipe.pk
+        ]
+
+    def test_deleted_recipe_is_not_found(self, user_client, make_recipe):
+        make_recipe(1).delete()
+        response = user_client.get('/api/recipes/', {'search': 'Рецепт'})
+        assert response.json()['results'] == []
+
+    def test_new_ingredient_is_found(self, user_client):
+        ingredient = Ingredient.objects.create(
+            name='Кардамон молотый', measurement_unit='г'
+        )
+        response = user_client.get('/api/ingredients/', {'search': 'дамон'})
+        assert [item['id'] for item in response.json()] == [ingredient.pk]
+
+    @sqlite_only
+    def test_triggers_exist_after_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )
+            triggers = {name for name, in cursor.fetchall()}
+        assert triggers >= {
+            f'{table}_fts_{suffix}'
+            for table in SEARCH_TABLES for suffix in ('ai', 'ad', 'au')
+        }
+
+    @sqlite_only
+    def test_search_uses_fts_index(self, rf):
+        from api.filters import NameSearchFilter
+
+        request = rf.get('/api/recipes/', {'search': 'яблок'})
+        request.query_params = request.GET
+        queryset = NameSearchFilter().filter_queryset(
+            request, Recipe.objects.all(), None
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        assert 'VIRTUAL TABLE INDEX' in plan
@@ -0,0 +1,216 @@
+import json
+
+import pytest
+from django.test import Client
+
+from recipes.bulk import RecipeImporter
+from recipes.models import (
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from users.models import User
+
+
+def assert_consistent():
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+    live = {
+        (row['user_id'], row['ingredient_id']): row['total']
+        for row in ShoppingListItem.objects.live_totals()
+    }
+    assert stored == live
+
+
+@pytest.fixture
+def admin_client(db):
+    admin = User.objects.create_superuser(
+        email='admin@example.com', username='admin', first_name='Админ',
+        last_name='Админ', password='password-12345',
+    )
+    client = Client()
+    client.force_login(admin)
+    return client
+
+
+@pytest.fixture
+def carts(make_client, make_user, make_recipe):
+    """Два рецепта в корзинах трёх пользователей."""
+    recipes = [make_recipe(1), make_recipe(2, amounts=(5, 6, 7))]
+    for number in range(3):
+        client = make_client(make_user(10 + number))
+        for recipe in recipes[:1 + number % 2]:
+            response = client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+            assert response.status_code == 201
+    assert_consistent()
+    return recipes
+
+
+@pytest.mark.django_db
+class TestShoppingListAggregate:
+
+    def test_cart_add_and_remove(self, carts):
+        user = ShoppingCart.objects.first().user
+        ShoppingCart.objects.filter(user=user).delete()
+        assert_consistent()
+
+    def test_api_update_ingredients(self, carts, make_client, ingredients):
+        client = make_client(carts[0].author)
+        response = client.patch(
+            f'/api/recipes/{carts[0].pk}/',
+            json.dumps({'ingredients': [
+                {'id': ingredients[1].pk, 'amount': 50},
+                {'id': ingredients[5].pk, 'amount': 3},
+            ]}),
+            content_type='application/json',
+        )
+        assert response.status_code == 200, response.content
+        assert_consistent()
+
+    def test_api_delete_recipe(self, carts, make_client):
+        client = make_client(carts[1].author)
+        assert client.delete(
+            f'/api/recipes/{carts[1].pk}/'
+        ).status_code == 204
+        assert_consistent()
+
+    def test_orm_single_object_writes(self, carts, ingredients):
+        item = IngredientAmount.objects.filter(recipe=carts[0]).first()
+        item.amount = 40
+        item.save()
+        assert_consistent()
+        item.ingredient = ingredients[9]
+        item.save()
+        assert_consistent()
+        item.recipe = carts[1]
+        item.save()
+        assert_consistent()
+        IngredientAmount.objects.create(
+            recipe=carts[0], ingredient=ingredients[8], amount=4
+        )
+        assert_consistent()
+        item.delete()
+        assert_consistent()
+        IngredientAmount.objects.filter(recipe=carts[1]).delete()
+        assert_consistent()
+
+    def test_cascades(self, carts, ingredients):
+        ingredients[0].delete()
+        assert_consistent()
+        Recipe.objects.filter(pk=carts[0].pk).delete()
+        assert_consistent()
+        carts[1].author.delete()
+        assert_consistent()
+
+    def test_ingredient_amount_admin(self, carts, admin_client,
+                                     ingredients):
+        item = IngredientAmount.objects.filter(recipe=carts[0]).first()
+        response = admin_client.post(
+            f'/admin/recipes/ingredientamount/{item.pk}/change/',
+            {
+                'ingredient': item.ingredient_id,
+                'recipe': item.recipe_id,
+                'amount': 50,
+            },
+        )
+        assert response.status_code == 302
+        assert IngredientAmount.objects.get(pk=item.pk).amount == 50
+        assert_consistent()
+        response = admin_client.post(
+            f'/admin/recipes/ingredientamount/{item.pk}/delete/',
+            {'post': 'yes'},
+        )
+        assert response.status_code == 302
+        assert_consistent()
+
+    def test_recipe_admin_inline(self, carts, admin_client, ingredients):
+        recipe = carts[0]
+        items = list(recipe.ingredients_amount.order_by('pk'))
+        data = {
+            'name': recipe.name,
+            'author': recipe.author_id,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.pk for tag in recipe.tags.all()],
+            'ingredients_amount-TOTAL_FORMS': len(items) + 1,
+            'ingredients_amount-INITIAL_FORMS': len(items),
+            'ingredients_amount-MIN_NUM_FORMS': 0,
+            'ingredients_amount-MAX_NUM_FORMS': 1000,
+        }
+        for number, item in enumerate(items):
+            data.update({
+                f'ingredients_amount-{number}-id': item.pk,
+                f'ingredients_amount-{number}-recipe': recipe.pk,
+                f'ingredients_amount-{number}-ingredient': item.ingredient_id,
+                f'ingredients_amount-{number}-amount': item.amount * 10,
+            })
+        data[f'ingredients_amount-{len(items) - 1}-DELETE'] = 'on'
+        data.update({
+            f'ingredients_amount-{len(items)}-recipe': recipe.pk,
+            f'ingredients_amount-{len(items)}-ingredient': ingredients[7].pk,
+            f'ingredients_amount-{len(items)}-amount': 9,
+        })
+        response = admin_client.post(
+            f'/admin/recipes/recipe/{recipe.pk}/change/', data
+        )
+        assert response.status_code == 302, response.context[
+            'adminform'
+        ].form.errors
+        assert recipe.ingredients_amount.get(
+            ingredient=ingredients[7]
+        ).amount == 9
+        assert_consistent()
+
+    def test_bulk_import_and_rebuild(self, carts, user, tags, ingredients):
+        importer = RecipeImporter(user).run([json.dumps({
+            'name': 'Импорт',
+            'text': 'Текст',
+            'cooking_time': 5,
+            'tags': [tags[0].slug],
+            'ingredients': [{
+                'name': ingredients[0].name,
+                'measurement_unit': ingredients[0].measurement_unit,
+                'amount': 3,
+            }],
+        })])
+        assert importer.created == 1, importer.errors
+        assert_consistent()
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.rebuild()
+        assert_consistent()
+
+
+@pytest.mark.django_db
+def test_concurrent_first_add(make_client, user, make_recipe, ingredients,
+                              monkeypatch):
+    """Позицию создал другой запрос уже после SELECT ... FOR UPDATE."""
+    recipe = make_recipe(1, amounts=(3,))
+    ShoppingListItem.objects.create(
+        user=user, ingredient=ingredients[0], amount=4
+    )
+    queryset_class = type(ShoppingListItem.objects.all())
+    select_for_update = queryset_class.select_for_update
+
+    def stale_select_for_update(self, *args, **kwargs):
+        # Первая выборка не видит строку, INSERT упирается в UNIQUE.
+        monkeypatch.setattr(
+            queryset_class, 'select_for_update', select_for_update
+        )
+        return self.none()
+
+    monkeypatch.setattr(
+        queryset_class, 'select_for_update', stale_select_for_update
+    )
+    response = make_client(user).post(
+        f'/api/recipes/{recipe.pk}/shopping_cart/'
+    )
+    assert response.status_code == 201
+    assert ShoppingListItem.objects.get(
+        user=user, ingredient=ingredients[0]
+    ).amount == 7
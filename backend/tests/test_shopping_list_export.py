@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+import pytest
+
+from api.renderers import ShoppingListRenderer
+from recipes.models import ShoppingCart
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, make_recipe, ingredients):
+    for recipe in (make_recipe(1, amounts=(1, 2)),
+                   make_recipe(2, amounts=(5, 6, 7))):
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    return [
+        (ingredients[0].name, 6, 'г'),
+        (ingredients[1].name, 8, 'г'),
+        (ingredients[2].name, 7, 'г'),
+    ]
+
+
+def download(client, **params):
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    assert response.streaming
+    return response, b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestShoppingListExport:
+
+    @pytest.mark.parametrize('params', ({}, {'format': 'txt'}))
+    def test_text(self, user_client, cart, params):
+        response, body = download(user_client, **params)
+        assert response['Content-Type'] == 'text/plain; charset=utf-8'
+        assert response['Content-Disposition'] == (
+            'attachment; filename="shopping_cart.txt"'
+        )
+        assert body == 'Список покупок:\n' + ''.join(
+            f'{name} - {amount}, {unit}\n' for name, amount, unit in cart
+        )
+
+    def test_csv(self, user_client, cart):
+        response, body = download(user_client, format='csv')
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        rows = list(csv.reader(io.StringIO(body)))
+        assert rows[0] == ['Ингредиент', 'Количество', 'Единица измерения']
+        assert rows[1:] == [
+            [name, str(amount), unit] for name, amount, unit in cart
+        ]
+
+    def test_json(self, user_client, cart):
+        response, body = download(user_client, format='json')
+        assert response['Content-Type'] == 'application/json; charset=utf-8'
+        assert json.loads(body) == [
+            {'name': name, 'amount': amount, 'measurement_unit': unit}
+            for name, amount, unit in cart
+        ]
+
+    @pytest.mark.parametrize('file_format', ('txt', 'csv', 'json'))
+    def test_empty_cart(self, user_client, file_format):
+        _, body = download(user_client, format=file_format)
+        if file_format == 'json':
+            assert json.loads(body) == []
+        else:
+            assert len(body.splitlines()) == 1
+
+    def test_unknown_format(self, user_client, cart):
+        assert user_client.get(URL, {'format': 'pdf'}).status_code == 404
+
+    def test_anonymous(self, make_client):
+        assert make_client().get(URL).status_code == 401
+
+
+def test_line_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListRenderer()
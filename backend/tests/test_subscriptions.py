@@ -0,0 +1,110 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users.models import Subscription
+
+
+@pytest.fixture
+def subscribed(make_user, make_recipe, user):
+    """Три автора в подписках user: с 5, 2 и 0 рецептами."""
+    authors = [make_user(10 + number) for number in range(3)]
+    for author, count in zip(authors, (5, 2, 0)):
+        for number in range(count):
+            make_recipe(f'{author.pk}-{number}', author=author)
+        Subscription.objects.create(user=user, author=author)
+    return authors
+
+
+def subscription_queries(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if 'FROM "users_subscription"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+class TestSubscriptions:
+
+    @pytest.mark.parametrize('limit', ('²', '٣', '-1', '1.5', 'abc'))
+    def test_invalid_recipes_limit(self, user_client, subscribed, limit):
+        response = user_client.get(
+            '/api/users/subscriptions/', {'recipes_limit': limit}
+        )
+        assert response.status_code == 400
+        assert 'recipes_limit' in response.json()
+
+    @pytest.mark.parametrize('limit', (0, 1, 3, 10))
+    def test_recipes_preview(self, user_client, subscribed, limit):
+        response = user_client.get(
+            '/api/users/subscriptions/', {'recipes_limit': limit}
+        )
+        assert response.status_code == 200
+        results = {item['id']: item for item in response.json()['results']}
+        for author in subscribed:
+            recipes = list(
+                author.recipes.order_by('-pub_date', '-id').values_list(
+                    'id', flat=True
+                )
+            )
+            item = results[author.pk]
+            assert item['is_subscribed'] is True
+            assert item['recipes_count'] == len(recipes)
+            assert [recipe['id'] for recipe in item['recipes']] == (
+                recipes[:limit]
+            )
+
+    def test_recipes_preview_without_limit(self, user_client, subscribed):
+        response = user_client.get('/api/users/subscriptions/')
+        counts = {
+            item['id']: len(item['recipes'])
+            for item in response.json()['results']
+        }
+        assert counts == {author.pk: author.recipes.count()
+                          for author in subscribed}
+
+    def test_query_count(self, user_client, subscribed, make_user,
+                         make_recipe, user):
+        def count():
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(
+                    '/api/users/subscriptions/', {'recipes_limit': 2}
+                )
+            assert response.status_code == 200
+            return len(context)
+
+        # Первый запрос дополнительно загружает токен в кеш.
+        count()
+        before = count()
+        for number in range(3):
+            author = make_user(20 + number)
+            make_recipe(f'extra-{number}', author=author)
+            Subscription.objects.create(user=user, author=author)
+        assert count() == before
+
+
+@pytest.mark.django_db
+class TestSubscribedIds:
+
+    def test_users_list_loads_subscriptions_once(self, user_client,
+                                                 subscribed, make_user):
+        others = [make_user(30 + number) for number in range(3)]
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get('/api/users/', {'limit': 50})
+        assert response.status_code == 200
+        flags = {
+            item['id']: item['is_subscribed']
+            for item in response.json()['results']
+        }
+        assert all(flags[author.pk] for author in subscribed)
+        assert not any(flags[other.pk] for other in others)
+        assert len(subscription_queries(context)) == 1
+
+    def test_anonymous_skips_query(self, make_client, subscribed):
+        with CaptureQueriesContext(connection) as context:
+            response = make_client().get('/api/users/', {'limit': 50})
+        assert response.status_code == 200
+        assert not any(
+            item['is_subscribed'] for item in response.json()['results']
+        )
+        assert subscription_queries(context) == []
@@ -0,0 +1,135 @@
+import base64
+import io
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+
+from api.serializers import FRAGMENT_NAMESPACES
+from recipes import images
+from recipes.images import make_thumbnail, run_in_background
+from recipes.models import Recipe, Revision
+
+
+def image_file(size=(960, 640), name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def assert_thumbnail(recipe):
+    assert recipe.image_thumb.name.startswith('recipes/thumbs/photo')
+    assert recipe.image_thumb.name.endswith('.webp')
+    with recipe.image_thumb.open('rb') as file, Image.open(file) as thumb:
+        assert thumb.format == 'WEBP'
+        assert thumb.size == (480, 320)
+
+
+@pytest.fixture
+def recipe(make_recipe):
+    recipe = make_recipe(1)
+    recipe.image.save('photo.png', image_file())
+    return recipe
+
+
+@pytest.mark.django_db
+def test_make_thumbnail(recipe):
+    updated_at = recipe.updated_at
+    assert make_thumbnail(recipe.pk)
+    recipe.refresh_from_db()
+    assert_thumbnail(recipe)
+    assert recipe.updated_at > updated_at
+    old_thumb = recipe.image_thumb
+    assert make_thumbnail(recipe.pk)
+    recipe.refresh_from_db()
+    assert recipe.image_thumb.name != old_thumb.name
+    assert not old_thumb.storage.exists(old_thumb.name)
+
+
+@pytest.mark.django_db
+def test_make_thumbnail_without_image(make_recipe):
+    recipe = make_recipe(1)
+    assert not make_thumbnail(recipe.pk)
+    assert not make_thumbnail(recipe.pk + 1)
+
+
+@pytest.mark.django_db
+def test_image_replaced_during_thumbnail(recipe, monkeypatch):
+    recipe.image.save('replaced.png', image_file())
+    render_thumbnail = images.render_thumbnail
+
+    def render_and_replace(file):
+        Recipe.objects.filter(pk=recipe.pk).update(image='recipes/new.png')
+        return render_thumbnail(file)
+
+    monkeypatch.setattr(images, 'render_thumbnail', render_and_replace)
+    assert not make_thumbnail(recipe.pk)
+    recipe.refresh_from_db()
+    assert not recipe.image_thumb
+    assert not any(
+        name.startswith('replaced')
+        for name in recipe.image.storage.listdir('recipes/thumbs')[1]
+    )
+
+
+@pytest.mark.django_db
+def test_broken_image_is_logged(recipe, caplog):
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image=recipe.image.storage.save('recipes/broken.png',
+                                        ContentFile(b'not image'))
+    )
+    run_in_background(recipe.pk)
+    assert f'миниатюру рецепта {recipe.pk}' in caplog.text
+    recipe.refresh_from_db()
+    assert not recipe.image_thumb
+
+
+@pytest.mark.django_db(transaction=True)
+def test_api_creates_thumbnail_in_background(user_client, recipe_data,
+                                             monkeypatch):
+    # Очистка базы транзакционными тестами удаляет строки Revision
+    # из миграции, без них запрос не уложится в бюджет.
+    Revision.objects.stamps(*FRAGMENT_NAMESPACES)
+    monkeypatch.setattr(images, '_executor', None)
+    recipe_data['image'] = 'data:image/png;base64,' + base64.b64encode(
+        image_file().read()
+    ).decode()
+    response = user_client.post(
+        '/api/recipes/', recipe_data, format='json'
+    )
+    assert response.status_code == 201, response.data
+    assert response.data['image_thumb'] == response.data['image']
+    # Миниатюра создаётся в пуле после коммита транзакции.
+    images._executor.shutdown(wait=True)
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_thumb
+    with recipe.image_thumb.open('rb') as file, Image.open(file) as thumb:
+        assert thumb.size == (480, 320)
+    response = user_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.data['image_thumb'].endswith(recipe.image_thumb.url)
+
+
+@pytest.mark.django_db
+def test_generate_thumbnails_command(recipe, make_recipe, capsys):
+    make_recipe(2)
+    call_command('generate_thumbnails')
+    assert 'Создано миниатюр: 1, ошибок: 0' in capsys.readouterr().out
+    recipe.refresh_from_db()
+    assert_thumbnail(recipe)
+    call_command('generate_thumbnails')
+    assert 'Создано миниатюр: 0, ошибок: 0' in capsys.readouterr().out
+    call_command('generate_thumbnails', '--all')
+    assert 'Создано миниатюр: 1, ошибок: 0' in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_generate_thumbnails_reports_errors(recipe, capsys):
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image=recipe.image.storage.save('recipes/broken.png',
+                                        ContentFile(b'not image'))
+    )
+    call_command('generate_thumbnails')
+    captured = capsys.readouterr()
+    assert 'Создано миниатюр: 0, ошибок: 1' in captured.out
+    assert f'Рецепт {recipe.pk}:' in captured.err
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from foodgram.pagination import CountStrategyPaginator
+
 from .models import Subscription, User
 
 
@@ -12,9 +14,16 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
     )
-    list_filter = ('username', 'email')
+    search_fields = ('username', 'email')
+    paginator = CountStrategyPaginator
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author',)
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = CountStrategyPaginator
+    show_full_result_count = False